@@ -0,0 +1,31 @@
+"""
+Gunicorn configuration, used by compose/production/django/start.
+
+The order events are streamed over server-sent events for up to ORDER_EVENTS_STREAM_TIMEOUT seconds,
+so the workers are gevent ones: a stream waiting on the broker only holds a greenlet instead of a whole
+sync worker, and the worker keeps notifying the arbiter while it streams so it isn't killed by the timeout.
+"""
+import multiprocessing
+import os
+
+bind = '0.0.0.0:5000'
+chdir = '/app'
+# The app is loaded once the worker is monkey patched, so the threading.local the contextvars backport keeps
+# the current context in is a greenlet local and the replica and shard routing of the requests don't leak
+preload_app = False
+
+worker_class = 'gevent'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Concurrent requests and open streams per worker
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+# Seconds without a heartbeat from the worker, the streams don't count against it with gevent
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# Seconds the streams are given to close on a restart before the worker is killed
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+
+def post_fork(server, worker):
+    # make psycopg2 yield to the other greenlets while it waits on postgres
+    from psycogreen.gevent import patch_psycopg
+
+    patch_psycopg()
@@ -1,10 +1,21 @@
+from django.conf import settings
 from django.urls import include, path
+from django.utils.module_loading import import_string
 
 from rest_framework.routers import DefaultRouter
 
+from food_delivery_app.core.uploads import LocalUploadBackend
+from food_delivery_app.core.views import LocalUploadView
+
 router_v1 = DefaultRouter('v1')
 
 urlpatterns = [
     path('restaurants/', include('food_delivery_app.restaurants.routers')),
 
 ] + router_v1.urls
+
+if issubclass(import_string(settings.UPLOAD_TICKETS_BACKEND), LocalUploadBackend):
+    # the other backends upload straight to the storage under its own policy, so the files never go through Django
+    urlpatterns += [
+        path('uploads/<str:ticket>/', LocalUploadView.as_view(), name='local-upload'),
+    ]
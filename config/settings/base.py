@@ -41,6 +41,33 @@ DATABASES = {
     'default': env.db('DATABASE_URL'),
 }
 DATABASES['default']['ATOMIC_REQUESTS'] = True
+# Read replicas, e.g. DATABASE_REPLICA_URLS=postgres://replica-1/db,postgres://replica-2/db
+# the safe requests of the restaurant viewsets read from them, see food_delivery_app.core.db_routers
+DATABASE_REPLICAS = []
+for index, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[]), start=1):
+    DATABASES['replica-{}'.format(index)] = dict(env.db_url_config(url), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append('replica-{}'.format(index))
+# Seconds of replication lag after which a replica is skipped, and how often the lag is checked per process
+DATABASE_REPLICA_MAX_LAG = 5
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = 5
+# Seconds a user reads from the primary after a write, so they see their own changes
+DATABASE_PRIMARY_STICKINESS = 15
+# Shards holding the menus and orders of the restaurants, e.g. DATABASE_SHARD_URLS=postgres://shard-1/db,
+# only append to the list, the primary is a shard too, see food_delivery_app.restaurants.sharding
+RESTAURANT_SHARDS = {'default': 0}
+for index, url in enumerate(env.list('DATABASE_SHARD_URLS', default=[]), start=1):
+    DATABASES['shard-{}'.format(index)] = dict(env.db_url_config(url), ATOMIC_REQUESTS=True)
+    RESTAURANT_SHARDS['shard-{}'.format(index)] = index
+# Every shard allocates the ids of the sharded tables from its own block, the n-th shard from n * block,
+# so the rows keep their ids when a restaurant is moved to another shard with the move_restaurant command
+# the ids are 32 bit integers, so there's room for 20 shards, the sequences are capped at the end of their block
+RESTAURANT_SHARD_ID_BLOCK = 10 ** 8
+# Shard of the new restaurants
+RESTAURANT_NEW_SHARD = env('RESTAURANT_NEW_SHARD', default='default')
+DATABASE_ROUTERS = [
+    'food_delivery_app.restaurants.sharding.ShardRouter',
+    'food_delivery_app.core.db_routers.ReplicaRouter',
+]
 
 # URLS
 # ------------------------------------------------------------------------------
@@ -60,6 +87,7 @@ DJANGO_APPS = [
     'django.contrib.staticfiles',
     # 'django.contrib.humanize', # Handy template tags
     'django.contrib.admin',
+    'django.contrib.postgres',
 ]
 THIRD_PARTY_APPS = [
     'crispy_forms',
@@ -161,6 +189,10 @@ STATICFILES_FINDERS = [
 MEDIA_ROOT = str(APPS_DIR('media'))
 # https://docs.djangoproject.com/en/dev/ref/settings/#media-url
 MEDIA_URL = '/media/'
+# https://docs.djangoproject.com/en/dev/ref/settings/#default-file-storage
+DEFAULT_FILE_STORAGE = 'food_delivery_app.core.storages.ContentAddressedFileSystemStorage'
+# Name the uploaded images after the hash of their content to store the same bytes once
+MEDIA_CONTENT_ADDRESSED = env.bool('DJANGO_MEDIA_CONTENT_ADDRESSED', default=False)
 
 # TEMPLATES
 # ------------------------------------------------------------------------------
@@ -255,7 +287,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'food_delivery_app.users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_RENDERER_CLASSES': (
         'rest_framework.renderers.JSONRenderer',
@@ -270,6 +302,102 @@ REST_FRAMEWORK = {
     'DEFAULT_VERSION': 'v1',
 }
 
+# TOKENS
+# ------------------------------------------------------------------------------
+# Seconds an authenticated token and its user are kept in the shared cache
+TOKEN_CACHE_TIMEOUT = 60 * 5
+# Size and seconds to live of the in-process cache in front of it, the deleted tokens and deactivated users
+# are only dropped from the cache of the process that changed them so keep it short
+TOKEN_LOCAL_CACHE_SIZE = 10000
+TOKEN_LOCAL_CACHE_TTL = 10
+
+# ORDER EVENTS
+# ------------------------------------------------------------------------------
+# Broker used to fan out the order status events to the server-sent events streams
+ORDER_EVENTS_BROKER = 'food_delivery_app.restaurants.events.InMemoryBroker'
+# Seconds between the keep-alive comments sent on an idle stream
+ORDER_EVENTS_HEARTBEAT = 15
+# Seconds before a stream is closed, the EventSource client reconnects on its own
+ORDER_EVENTS_STREAM_TIMEOUT = 300
+
+# BACKGROUND TASKS
+# ------------------------------------------------------------------------------
+# Threads of the in-process pool running the tasks scheduled after a commit
+BACKGROUND_TASKS_WORKERS = 4
+# Run the tasks synchronously in the calling thread
+BACKGROUND_TASKS_EAGER = False
+
+# HOT CACHE ENTRIES
+# ------------------------------------------------------------------------------
+# Seconds an expired entry of core.cache.get_or_compute is still served while a single worker recomputes it
+CACHE_STALE_TIMEOUT = 60
+# Seconds the worker recomputing an entry holds its lock at most, and the others wait for a missing entry
+CACHE_LOCK_TIMEOUT = 10
+CACHE_LOCK_WAIT_TIMEOUT = 2
+CACHE_LOCK_WAIT_INTERVAL = 0.05
+# How early the hot entries are recomputed before they expire, 0 to only recompute them once expired
+CACHE_EARLY_REFRESH_BETA = 1.0
+
+# IMAGES
+# ------------------------------------------------------------------------------
+# Bounding boxes of the resized copies made of the item images and restaurant logos
+IMAGE_RENDITIONS = {
+    'thumbnail': (200, 200),
+    'medium': (800, 800),
+}
+IMAGE_RENDITION_QUALITY = 85
+
+# RESTAURANTS
+# ------------------------------------------------------------------------------
+# Seconds the restaurant of the nested API URLs is kept in the shared cache, 0 to fetch it on every request
+RESTAURANT_CACHE_TIMEOUT = 60
+# Seconds the ids of the restaurants a user is member of are cached, they're dropped when the memberships change
+RESTAURANT_MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+# Seconds the rendered categories, item sizes and items of a restaurant are cached, they're keyed by its menu
+# version so they're replaced as soon as the menu changes, 0 to render them on every request
+RESTAURANT_RESPONSE_CACHE_TIMEOUT = 60 * 60
+# Seconds the shard of a restaurant is kept in the shared cache, and size and seconds to live of the in-process
+# cache in front of it, move_restaurant waits for the in-process caches to expire before deleting the moved rows
+RESTAURANT_SHARD_CACHE_TIMEOUT = 60 * 60
+RESTAURANT_SHARD_LOCAL_CACHE_SIZE = 10000
+RESTAURANT_SHARD_LOCAL_CACHE_TTL = 10
+# Seconds the background writes to a restaurant wait for it to be moved to another shard, and how often it's checked
+RESTAURANT_MOVE_WAIT_TIMEOUT = 5 * 60
+RESTAURANT_MOVE_WAIT_INTERVAL = 1
+
+# UPLOADS
+# ------------------------------------------------------------------------------
+# Backend issuing the targets the clients upload the images to
+UPLOAD_TICKETS_BACKEND = 'food_delivery_app.core.uploads.LocalUploadBackend'
+# Seconds an upload ticket can be used for
+UPLOAD_TICKET_EXPIRY = 60 * 15
+UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+UPLOAD_CONTENT_TYPES = ['image/jpeg', 'image/png', 'image/webp']
+
+# MENU
+# ------------------------------------------------------------------------------
+# Locales a menu snapshot is rendered for, the first one is the fallback
+MENU_SNAPSHOT_LOCALES = [LANGUAGE_CODE]
+# Publish every menu snapshot gzipped to the media storage to be served by the CDN
+MENU_EXPORT_ENABLED = True
+# Seconds the clients and the CDN may cache the manifest pointing to the published menu
+MENU_MANIFEST_MAX_AGE = 60
+# Seconds before a stale menu read schedules its rebuild again, if the last one was lost with its worker
+MENU_REBUILD_TIMEOUT = 60
+
+# AUTOCOMPLETE
+# ------------------------------------------------------------------------------
+# Number of suggestions returned for restaurants and items
+AUTOCOMPLETE_LIMIT = 5
+# Queries shorter than this don't hit the database
+AUTOCOMPLETE_MIN_LENGTH = 2
+# Minimum pg_trgm word similarity of a suggestion, postgres defaults to 0.6
+AUTOCOMPLETE_SIMILARITY_THRESHOLD = 0.4
+# Latency budget of the autocomplete queries in milliseconds
+AUTOCOMPLETE_STATEMENT_TIMEOUT = 50
+# Size and seconds to live of the in-process cache of hot queries
+AUTOCOMPLETE_CACHE_SIZE = 1024
+AUTOCOMPLETE_CACHE_TTL = 60
 
 # Your stuff...
 # ------------------------------------------------------------------------------
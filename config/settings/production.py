@@ -13,6 +13,8 @@ ALLOWED_HOSTS = env.list('DJANGO_ALLOWED_HOSTS', default=['example.com'])
 DATABASES['default'] = env.db('DATABASE_URL')  # noqa F405
 DATABASES['default']['ATOMIC_REQUESTS'] = True  # noqa F405
 DATABASES['default']['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=60)  # noqa F405
+for alias in DATABASES.keys() - {'default'}:  # noqa F405
+    DATABASES[alias]['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=60)  # noqa F405
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -82,20 +84,32 @@ STATIC_URL = f'https://{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/static/'
 # Full-fledge class: https://stackoverflow.com/a/18046120/104731
 from storages.backends.s3boto3 import S3Boto3Storage  # noqa E402
 
+from food_delivery_app.core.storages import ContentAddressedStorageMixin  # noqa E402
+
 
 class StaticRootS3Boto3Storage(S3Boto3Storage):
     location = 'static'
 
 
-class MediaRootS3Boto3Storage(S3Boto3Storage):
+class MediaRootS3Boto3Storage(ContentAddressedStorageMixin, S3Boto3Storage):
     location = 'media'
     file_overwrite = False
 
+    def _save_content(self, obj, content, parameters):
+        cache_control = self.get_cache_control(obj.key)
+        if cache_control:
+            parameters = dict(parameters or {}, CacheControl=cache_control)
+        super()._save_content(obj, content, parameters)
+
 
 # endregion
 DEFAULT_FILE_STORAGE = 'config.settings.production.MediaRootS3Boto3Storage'
 MEDIA_URL = f'https://{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/media/'
 
+# UPLOADS
+# ------------------------------------------------------------------------------
+UPLOAD_TICKETS_BACKEND = 'food_delivery_app.core.uploads.S3UploadBackend'
+
 # TEMPLATES
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#templates
@@ -197,5 +211,10 @@ LOGGING = {
 }
 
 
+# ORDER EVENTS
+# ------------------------------------------------------------------------------
+ORDER_EVENTS_BROKER = 'food_delivery_app.restaurants.events.RedisBroker'
+ORDER_EVENTS_REDIS_URL = env('REDIS_URL')
+
 # Your stuff...
 # ------------------------------------------------------------------------------
@@ -14,6 +14,14 @@ SECRET_KEY = env("DJANGO_SECRET_KEY", default="Y6gnBwU5CVg2LTmLaj66v9wh6kGELHofd
 # https://docs.djangoproject.com/en/dev/ref/settings/#test-runner
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
+# DATABASES
+# ------------------------------------------------------------------------------
+# a second connection to the test database, the replica tests turn it on with DATABASE_REPLICAS
+DATABASES["replica"] = dict(DATABASES["default"], ATOMIC_REQUESTS=False, TEST={"MIRROR": "default"})  # noqa F405
+# and a shard on a database of its own, the restaurants are only moved there by the sharding tests
+DATABASES["shard-1"] = dict(DATABASES["default"], TEST={"NAME": "test_food_delivery_app_shard_1"})  # noqa F405
+RESTAURANT_SHARDS = {"default": 0, "shard-1": 1}
+
 # CACHES
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#caches
@@ -28,6 +36,19 @@ CACHES = {
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
 PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 
+# BACKGROUND TASKS
+# ------------------------------------------------------------------------------
+BACKGROUND_TASKS_EAGER = True
+
+# MENU
+# ------------------------------------------------------------------------------
+MENU_EXPORT_ENABLED = False
+
+# RESTAURANTS
+# ------------------------------------------------------------------------------
+# the tests don't commit, so the menu version the cached responses are keyed by isn't bumped
+RESTAURANT_RESPONSE_CACHE_TIMEOUT = 0
+
 # TEMPLATES
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#templates
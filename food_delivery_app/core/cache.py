@@ -0,0 +1,126 @@
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class LocalTTLCache:
+    '''
+        Small thread safe in-process LRU cache whose entries expire after ttl seconds,
+        for hot values that aren't worth a round trip to the shared cache
+    '''
+    missing = object()
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key, self.missing)
+            if entry is self.missing:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def lock_key(key):
+    return '{}:lock'.format(key)
+
+
+def acquire_lock(key):
+    return cache.add(lock_key(key), True, settings.CACHE_LOCK_TIMEOUT)
+
+
+def release_lock(key):
+    cache.delete(lock_key(key))
+
+
+def wait_for_lock(key):
+    '''
+        Wait up to CACHE_LOCK_WAIT_TIMEOUT seconds for the worker holding the lock of the key to release it,
+        returns whether it was released
+    '''
+    deadline = time.monotonic() + settings.CACHE_LOCK_WAIT_TIMEOUT
+    while cache.get(lock_key(key)) is not None:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(settings.CACHE_LOCK_WAIT_INTERVAL)
+    return True
+
+
+def get_entry(key):
+    '''
+        Look up an entry stored by set_entry and tell whether this worker has to recompute it, returns
+        (value, recompute), value is None on a miss. Only the worker that takes the lock of the key recomputes it,
+        an expired entry is served to the others meanwhile and they wait for a missing one.
+        A fresh entry is recomputed ahead of its expiry with a probability that grows as the expiry nears and
+        with the time it took to compute, so the hot entries are refreshed before they expire (XFetch)
+    '''
+    entry = cache.get(key)
+    if entry is not None:
+        value, compute_time, expires_at = entry
+        early = compute_time * settings.CACHE_EARLY_REFRESH_BETA * -math.log(1 - random.random())
+        if time.time() + early < expires_at:
+            return value, False
+        return value, acquire_lock(key)
+
+    if acquire_lock(key):
+        return None, True
+    if wait_for_lock(key):
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0], False
+    # the worker holding the lock is too slow or failed, compute it here too
+    return None, True
+
+
+def set_entry(key, value, timeout, compute_time):
+    '''
+        Store the value for timeout seconds plus CACHE_STALE_TIMEOUT seconds it's served for while
+        it's recomputed, and release the lock of the key
+    '''
+    cache.set(key, (value, compute_time, time.time() + timeout), timeout + settings.CACHE_STALE_TIMEOUT)
+    release_lock(key)
+
+
+def get_or_compute(key, compute, timeout):
+    '''
+        cache.get_or_set protected from stampedes, see get_entry
+    '''
+    value, recompute = get_entry(key)
+    if not recompute:
+        return value
+    started_at = time.monotonic()
+    try:
+        value = compute()
+    except BaseException:
+        release_lock(key)
+        raise
+    set_entry(key, value, timeout, time.monotonic() - started_at)
+    return value
@@ -0,0 +1,91 @@
+import contextvars
+import logging
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, DatabaseError
+
+from .cache import LocalTTLCache
+
+logger = logging.getLogger(__name__)
+
+# set for the safe requests of the views using ReplicaReadsMixin, everything else stays on the primary
+_read_from_replica = contextvars.ContextVar('read_from_replica', default=False)
+
+replica_lags_cache = LocalTTLCache(maxsize=64, ttl=settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL)
+
+REPLICA_LAG_SQL = '''
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+'''
+
+
+def read_from_replica(enabled):
+    return _read_from_replica.set(enabled)
+
+
+def get_replica_lag(alias):
+    '''
+        Seconds the replica is behind the primary, 0 for the databases that aren't streaming replicas
+    '''
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(REPLICA_LAG_SQL)
+        return float(cursor.fetchone()[0])
+
+
+def is_replica_healthy(alias):
+    '''
+        Whether the replica is within DATABASE_REPLICA_MAX_LAG, the lag is checked once
+        every DATABASE_REPLICA_LAG_CHECK_INTERVAL seconds per process and a replica that can't be reached is skipped
+    '''
+    lag = replica_lags_cache.get(alias)
+    if lag is None:
+        try:
+            lag = get_replica_lag(alias)
+        except DatabaseError:
+            logger.warning('Replica %s is unreachable, reading from the primary', alias, exc_info=True)
+            lag = float('inf')
+        replica_lags_cache.set(alias, lag)
+    return lag <= settings.DATABASE_REPLICA_MAX_LAG
+
+
+def primary_pin_key(user_id):
+    return 'users:{}:primary-pin'.format(user_id)
+
+
+def pin_to_primary(user):
+    if user and user.is_authenticated:
+        cache.set(primary_pin_key(user.pk), True, settings.DATABASE_PRIMARY_STICKINESS)
+
+
+def is_pinned_to_primary(user):
+    return bool(user and user.is_authenticated) and bool(cache.get(primary_pin_key(user.pk)))
+
+
+class ReplicaRouter:
+    '''
+        Send the reads to a random healthy replica of DATABASE_REPLICAS while read_from_replica is on,
+        the writes, the migrations and the reads of everything else go to the primary
+    '''
+
+    def db_for_read(self, model, **hints):
+        if not _read_from_replica.get():
+            return 'default'
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if is_replica_healthy(alias)]
+        return random.choice(replicas) if replicas else 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,109 @@
+import io
+import os
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image
+
+# EXIF orientation tag and the transpositions that undo each orientation
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSES = {
+    2: [Image.FLIP_LEFT_RIGHT],
+    3: [Image.ROTATE_180],
+    4: [Image.FLIP_TOP_BOTTOM],
+    5: [Image.ROTATE_90, Image.FLIP_TOP_BOTTOM],
+    6: [Image.ROTATE_270],
+    7: [Image.ROTATE_270, Image.FLIP_TOP_BOTTOM],
+    8: [Image.ROTATE_90],
+}
+# sent once the renditions of an instance are stored, they're saved with an update so there's no post_save
+renditions_changed = Signal(providing_args=['instance', 'using'])
+
+RENDITION_FORMATS = {
+    'jpeg': ('JPEG', 'jpg'),
+    'webp': ('WEBP', 'webp'),
+}
+
+
+def apply_exif_orientation(image):
+    '''
+        The renditions are saved without the EXIF metadata, so rotate the pixels the way the camera meant
+    '''
+    try:
+        orientation = (image._getexif() or {}).get(EXIF_ORIENTATION)
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+        orientation = None
+    for transpose in ORIENTATION_TRANSPOSES.get(orientation, []):
+        image = image.transpose(transpose)
+    return image
+
+
+def rendition_name(name, rendition, extension):
+    return '{}-{}.{}'.format(os.path.splitext(name)[0], rendition, extension)
+
+
+def create_renditions(field_file):
+    '''
+        Save every size of IMAGE_RENDITIONS in every format of RENDITION_FORMATS next to the original file,
+        returns {rendition: {format: name}} plus the name of the source they were made from
+    '''
+    storage = field_file.storage
+    with field_file.open('rb') as source:
+        original = Image.open(source)
+        original.load()
+    original = apply_exif_orientation(original)
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+    renditions = {'source': field_file.name}
+    for rendition, size in settings.IMAGE_RENDITIONS.items():
+        image = original.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        renditions[rendition] = {}
+        for image_format, (pil_format, extension) in RENDITION_FORMATS.items():
+            output = image.convert('RGB') if pil_format == 'JPEG' else image
+            content = io.BytesIO()
+            output.save(content, pil_format, quality=settings.IMAGE_RENDITION_QUALITY, optimize=True)
+            name = storage.save(rendition_name(field_file.name, rendition, extension), ContentFile(content.getvalue()))
+            renditions[rendition][image_format] = name
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for rendition, files in renditions.items():
+        if rendition != 'source':
+            for name in files.values():
+                storage.delete(name)
+
+
+def process_image_renditions(model_label, pk, field_name, renditions_field_name, source_name, using=None):
+    '''
+        Background task creating the renditions of the image of a model instance saved to the `using` database,
+        or dropping them if the image was removed, they're only stored if the image is still the one
+        the task was scheduled for
+    '''
+    model = apps.get_model(model_label)
+    instance = model.objects.using(using).filter(pk=pk).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field_name)
+    if (field_file.name or '') != source_name:
+        return
+
+    if source_name:
+        renditions = create_renditions(field_file)
+        same_source = Q(**{field_name: source_name})
+    else:
+        renditions = {}
+        same_source = Q(**{field_name: ''}) | Q(**{field_name + '__isnull': True})
+    updated = model.objects.using(using).filter(same_source, pk=pk).update(
+        **{renditions_field_name: renditions, 'modified': timezone.now()}
+    )
+    old_renditions = getattr(instance, renditions_field_name)
+    delete_renditions(field_file.storage, old_renditions if updated else renditions)
+    if updated:
+        renditions_changed.send(sender=model, instance=instance, using=instance._state.db)
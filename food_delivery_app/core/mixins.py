@@ -0,0 +1,99 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .db_routers import read_from_replica, pin_to_primary, is_pinned_to_primary
+from .serializers import UploadTicketSerializer, UploadConfirmSerializer
+from .uploads import create_upload_ticket, attach_upload
+
+
+class ConditionalGetMixin:
+    '''
+        ETag and Last-Modified support for list/retrieve of TimeStampedModel viewsets,
+        the validators are computed from max(modified) and count of the filtered queryset
+        so unchanged resources answer 304 without being serialized
+    '''
+    modified_field = 'modified'
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        # a deleted row doesn't move max(modified), so lists are only validated by the ETag that has the count
+        return self.conditional_response(queryset, False, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            queryset = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            # a lookup that isn't a valid value of the field, like get_object_or_404
+            raise Http404
+        return self.conditional_response(queryset, True, super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, queryset, use_last_modified, view, request, *args, **kwargs):
+        state = queryset.order_by().aggregate(last_modified=Max(self.modified_field), count=Count('pk'))
+        if not state['count']:
+            return view(request, *args, **kwargs)
+
+        last_modified = int(state['last_modified'].timestamp())
+        etag = quote_etag(hashlib.md5('{}|{}|{}|{}'.format(
+            request.get_full_path(), request.accepted_media_type, state['count'], state['last_modified'].isoformat()
+        ).encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag,
+                                            last_modified=last_modified if use_last_modified else None)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class UploadTicketMixin:
+    '''
+        Let the clients upload the file of upload_field straight to the storage instead of through the API:
+        POST {detail}/upload/ issues a signed upload target and POST {detail}/upload/confirm/ attaches the file
+    '''
+    upload_field = None
+
+    @action(methods=['post'], detail=True, url_path='upload', url_name='upload')
+    def upload(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = UploadTicketSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ticket = create_upload_ticket(request, instance, self.upload_field, **serializer.validated_data)
+        return Response(status=status.HTTP_201_CREATED, data=ticket)
+
+    @action(methods=['post'], detail=True, url_path='upload/confirm', url_name='upload-confirm')
+    def confirm_upload(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = UploadConfirmSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        instance = attach_upload(instance, self.upload_field, serializer.validated_data['ticket'])
+        return Response(status=status.HTTP_200_OK, data=self.get_serializer(instance).data)
+
+
+class ReplicaReadsMixin:
+    '''
+        Serve the safe requests from the read replicas, except for the users who wrote in the last
+        DATABASE_PRIMARY_STICKINESS seconds so they read their own writes, the writes pin the user to the primary
+    '''
+
+    def initial(self, request, *args, **kwargs):
+        # authenticate against the primary, a token created a moment ago may not be replicated yet
+        request.user
+        if request.method in permissions.SAFE_METHODS and not is_pinned_to_primary(request.user):
+            read_from_replica(True)
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        read_from_replica(False)
+        if request.method not in permissions.SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,12 @@
+from django.conf import settings
+from rest_framework import serializers
+
+
+class UploadTicketSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=100)
+    content_type = serializers.ChoiceField(choices=settings.UPLOAD_CONTENT_TYPES)
+    size = serializers.IntegerField(min_value=1, max_value=settings.UPLOAD_MAX_SIZE)
+
+
+class UploadConfirmSerializer(serializers.Serializer):
+    ticket = serializers.CharField()
@@ -0,0 +1,42 @@
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_ADDRESSED_NAME = re.compile(r'/sha256/[0-9a-f]{2}/[0-9a-f]{64}(\.[^/]*)?$')
+
+
+class ContentAddressedStorageMixin:
+    '''
+        Files named after the hash of their content (see core.utils.media_file_name) are never renamed
+        or uploaded twice, the bytes are already there under the same name, so they can be cached forever
+    '''
+    immutable_cache_control = 'public, max-age=31536000, immutable'
+
+    def is_content_addressed(self, name):
+        return CONTENT_ADDRESSED_NAME.search(name) is not None
+
+    def get_available_name(self, name, max_length=None):
+        if self.is_content_addressed(name):
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if self.is_content_addressed(name) and self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    def get_cache_control(self, name):
+        return self.immutable_cache_control if self.is_content_addressed(name) else None
+
+
+class ContentAddressedFileSystemStorage(ContentAddressedStorageMixin, FileSystemStorage):
+
+    def _save(self, name, content):
+        if not self.is_content_addressed(name) or self.exists(name):
+            return super()._save(name, content)
+        # FileSystemStorage retries forever if the name is taken meanwhile by a concurrent upload of the same bytes,
+        # so write under a unique name and move it in place
+        temp_name = super()._save(FileSystemStorage.get_available_name(self, name), content)
+        os.replace(self.path(temp_name), self.path(name))
+        return name
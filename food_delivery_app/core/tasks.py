@@ -0,0 +1,43 @@
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_TASKS_WORKERS,
+                                               thread_name_prefix='background-task')
+    return _executor
+
+
+def run_task(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        # every worker thread opens its own connections
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    '''
+        Run func in a thread of the process-wide pool without making the request wait for it,
+        with BACKGROUND_TASKS_EAGER it runs right away in the calling thread, which is what the tests use.
+        Either way it runs in an empty context, so it doesn't inherit the replica reads or the restaurant of the request
+    '''
+    if settings.BACKGROUND_TASKS_EAGER:
+        return contextvars.Context().run(func, *args, **kwargs)
+    return get_executor().submit(run_task, func, *args, **kwargs)
@@ -0,0 +1,47 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ..cache import get_or_compute, acquire_lock, release_lock, set_entry, lock_key
+
+
+@override_settings(CACHE_LOCK_WAIT_TIMEOUT=0)
+class TestGetOrCompute(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.compute = mock.Mock(return_value='fresh')
+
+    def test_computed_once(self):
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'fresh')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'fresh')
+        self.compute.assert_called_once_with()
+        self.assertIsNone(cache.get(lock_key('key')))
+
+    def test_expired_entry_is_served_while_recomputed(self):
+        set_entry('key', 'stale', -1, 0)
+
+        # another worker is recomputing it
+        acquire_lock('key')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'stale')
+        self.compute.assert_not_called()
+
+        release_lock('key')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'fresh')
+
+    @mock.patch('food_delivery_app.core.cache.random.random', return_value=0.999)
+    def test_early_refresh(self, random):
+        # fresh for a minute, but it took long to compute
+        set_entry('key', 'old', 60, 30)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'fresh')
+
+        random.return_value = 0.5
+        set_entry('key', 'old', 60, 0.01)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'old')
+
+    def test_failed_compute_releases_the_lock(self):
+        self.compute.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            get_or_compute('key', self.compute, 60)
+        self.assertIsNone(cache.get(lock_key('key')))
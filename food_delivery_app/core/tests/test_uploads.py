@@ -0,0 +1,22 @@
+import importlib
+
+from django.test import SimpleTestCase, override_settings
+
+from config import routers
+
+
+class TestLocalUploadRoute(SimpleTestCase):
+
+    def tearDown(self):
+        importlib.reload(routers)
+
+    def get_route_names(self):
+        return [getattr(pattern, 'name', None) for pattern in importlib.reload(routers).urlpatterns]
+
+    def test_mounted_with_the_local_backend(self):
+        with override_settings(UPLOAD_TICKETS_BACKEND='food_delivery_app.core.uploads.LocalUploadBackend'):
+            self.assertIn('local-upload', self.get_route_names())
+
+    def test_not_mounted_with_the_s3_backend(self):
+        with override_settings(UPLOAD_TICKETS_BACKEND='food_delivery_app.core.uploads.S3UploadBackend'):
+            self.assertNotIn('local-upload', self.get_route_names())
@@ -0,0 +1,127 @@
+import threading
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+UPLOAD_TICKET_SALT = 'food_delivery_app.core.uploads'
+
+
+def sign_ticket(data):
+    return signing.dumps(data, salt=UPLOAD_TICKET_SALT)
+
+
+def load_ticket(ticket):
+    '''
+        The data of a ticket signed by sign_ticket, raises signing.BadSignature if it's forged or expired
+    '''
+    return signing.loads(ticket, salt=UPLOAD_TICKET_SALT, max_age=settings.UPLOAD_TICKET_EXPIRY)
+
+
+class S3UploadBackend:
+    '''
+        Presigned POST straight to the S3 bucket of the media storage,
+        the policy pins the key and content type and caps the size of the upload
+    '''
+
+    def get_target(self, request, ticket, data):
+        storage = default_storage
+        key = storage._normalize_name(storage._clean_name(data['key']))
+        post = storage.bucket.meta.client.generate_presigned_post(
+            Bucket=storage.bucket_name,
+            Key=key,
+            Fields={'Content-Type': data['content_type']},
+            Conditions=[
+                {'Content-Type': data['content_type']},
+                ['content-length-range', 1, data['size']],
+            ],
+            ExpiresIn=settings.UPLOAD_TICKET_EXPIRY,
+        )
+        return {'method': 'POST', 'url': post['url'], 'fields': post['fields']}
+
+
+class LocalUploadBackend:
+    '''
+        Stand-in for the storages that can't take uploads from the clients, the file is PUT to the upload view
+        with the signed ticket in its URL, it goes through Django so it's meant for tests and the local runserver
+    '''
+
+    def get_target(self, request, ticket, data):
+        url = reverse('api_v1:local-upload', kwargs={'ticket': ticket})
+        return {'method': 'PUT', 'url': request.build_absolute_uri(url), 'fields': {}}
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_upload_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.UPLOAD_TICKETS_BACKEND)()
+    return _backend
+
+
+def create_upload_ticket(request, instance, field_name, filename, content_type, size):
+    '''
+        Sign where the client may upload the file of instance's field_name and return the upload target,
+        the key is generated by the field's upload_to as if the file was uploaded through the API
+    '''
+    field = instance._meta.get_field(field_name)
+    data = {
+        'model': instance._meta.label,
+        'pk': instance.pk,
+        'field': field_name,
+        'key': field.generate_filename(instance, filename),
+        'content_type': content_type,
+        'size': size,
+    }
+    ticket = sign_ticket(data)
+    target = get_upload_backend().get_target(request, ticket, data)
+    return dict(target, ticket=ticket, key=data['key'], expires_in=settings.UPLOAD_TICKET_EXPIRY)
+
+
+def is_image(storage, name, content_type):
+    '''
+        Whether the file decodes as an image of the content type, like the ImageField validation
+    '''
+    try:
+        with storage.open(name) as file:
+            image = Image.open(file)
+            image.verify()
+    except Exception:
+        return False
+    return image.get_format_mimetype() == content_type
+
+
+def attach_upload(instance, field_name, ticket):
+    '''
+        Point instance's field_name to the file uploaded with the ticket, once it's checked that the ticket
+        was issued for this field and the file is in the storage within the size it was issued for
+        and is an image of the content type it was issued for
+    '''
+    try:
+        data = load_ticket(ticket)
+    except signing.BadSignature:
+        raise ValidationError({"errors": "The upload ticket is invalid or expired"})
+    if (data['model'], data['pk'], data['field']) != (instance._meta.label, instance.pk, field_name):
+        raise ValidationError({"errors": "The upload ticket was issued for another file"})
+    storage = instance._meta.get_field(field_name).storage
+    if not storage.exists(data['key']):
+        raise ValidationError({"errors": "The file isn't uploaded yet"})
+    if storage.size(data['key']) > data['size']:
+        storage.delete(data['key'])
+        raise ValidationError({"errors": "The uploaded file is larger than the ticket allows"})
+    if not is_image(storage, data['key'], data['content_type']):
+        storage.delete(data['key'])
+        raise ValidationError({"errors": "The uploaded file isn't a valid {} image".format(data['content_type'])})
+
+    setattr(instance, field_name, data['key'])
+    instance.save()
+    return instance
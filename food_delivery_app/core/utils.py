@@ -1,13 +1,39 @@
+import hashlib
 import os
 
 from functools import wraps
+from django.conf import settings
+from django.db.models import Case, When, Value
 from django.utils import crypto
 
 
-def media_file_name(directory, container_id_field):
+def content_hash(file, algorithm='sha256'):
+    file_hash = hashlib.new(algorithm)
+    file.seek(0)
+    for chunk in file.chunks():
+        file_hash.update(chunk)
+    file.seek(0)
+    return file_hash.hexdigest()
+
+
+def media_file_name(directory, container_id_field, file_field=None):
+    '''
+        With MEDIA_CONTENT_ADDRESSED the file of file_field is named after the hash of its content,
+        so the same bytes uploaded for many containers share one file, see core.storages
+    '''
     @wraps(media_file_name)
     def wrapped(instance, filename):
         name, ext = os.path.splitext(filename)
+        field_file = getattr(instance, file_field) if file_field else None
+        # only a file being uploaded through the field can be hashed, not a name picked before the upload
+        if settings.MEDIA_CONTENT_ADDRESSED and field_file and not field_file._committed:
+            digest = content_hash(field_file.file)
+            return '{directory}/sha256/{prefix}/{digest}{ext}'.format(
+                directory=directory,
+                prefix=digest[:2],
+                digest=digest,
+                ext=ext.lower()
+            )
         file_path = '{directory}/container_{user_id}/{name}-{suffix}{ext}'.format(
             directory=directory,
             user_id=getattr(instance, container_id_field),
@@ -17,3 +43,15 @@ def media_file_name(directory, container_id_field):
         )
         return file_path
     return wrapped
+
+
+def bulk_update_field(queryset, field_name, values, **fields):
+    '''
+        Update field_name of many rows with a single UPDATE query,
+        values maps the pk of every row to update to its new value, fields are set on all of them
+    '''
+    if not values:
+        return 0
+    field = queryset.model._meta.get_field(field_name)
+    whens = [When(pk=pk, then=Value(value)) for pk, value in values.items()]
+    return queryset.filter(pk__in=list(values)).update(**{field_name: Case(*whens, output_field=field)}, **fields)
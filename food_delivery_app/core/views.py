@@ -0,0 +1,35 @@
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .uploads import load_ticket
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class LocalUploadView(View):
+    '''
+        Target of the LocalUploadBackend tickets, the ticket in the URL is the only credential like a presigned URL
+    '''
+
+    def put(self, request, ticket):
+        try:
+            data = load_ticket(ticket)
+        except signing.BadSignature:
+            return JsonResponse(status=403, data={"errors": "The upload ticket is invalid or expired"})
+        if request.content_type != data['content_type']:
+            return JsonResponse(status=400, data={"errors": "The upload ticket is for {}".format(data['content_type'])})
+        size = int(request.META.get('CONTENT_LENGTH') or 0)
+        if not 0 < size <= data['size']:
+            return JsonResponse(status=400, data={"errors": "The file is larger than the ticket allows"})
+        if default_storage.exists(data['key']):
+            return JsonResponse(status=409, data={"errors": "The upload ticket is already used"})
+
+        # the request body is read in chunks straight into the storage
+        file = File(request, name=data['key'])
+        file.size = size
+        default_storage.save(data['key'], file)
+        return HttpResponse(status=201)
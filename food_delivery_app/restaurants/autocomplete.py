@@ -0,0 +1,117 @@
+import logging
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.models import CharField, FloatField, Func, Lookup, Q, Value
+from django.db.models.lookups import IContains
+
+from food_delivery_app.core.cache import LocalTTLCache
+
+from .models import Restaurant, Item
+
+logger = logging.getLogger(__name__)
+
+suggestions_cache = LocalTTLCache(maxsize=settings.AUTOCOMPLETE_CACHE_SIZE, ttl=settings.AUTOCOMPLETE_CACHE_TTL)
+
+
+@CharField.register_lookup
+class TrigramWordSimilar(Lookup):
+    '''
+        `name %> query`, true when the query is similar to any word of the name, Django ships it from 3.0
+    '''
+    lookup_name = 'trigram_word_similar'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s %%%%> %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+@CharField.register_lookup
+class TrigramIContains(IContains):
+    '''
+        `name ILIKE %query%`, icontains compiles to `UPPER(name) LIKE UPPER(%query%)` which the pg_trgm index
+        of the name can't serve
+    '''
+    lookup_name = 'trigram_icontains'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return '%s ILIKE %s' % (lhs, rhs), lhs_params + rhs_params
+
+
+class TrigramWordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, expression, string, **extra):
+        if not hasattr(string, 'resolve_expression'):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
+
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
+
+
+def get_suggestions(queryset, query, fields, limit):
+    '''
+        Typo tolerant match of the query against the words of the name or substring match for prefixes
+        too short to be similar enough, both served by the pg_trgm GIN index and ranked by similarity
+    '''
+    return list(queryset.filter(Q(name__trigram_word_similar=query) | Q(name__trigram_icontains=query))
+                .annotate(similarity=TrigramWordSimilarity('name', query))
+                .order_by('-similarity', 'pk')
+                .values(*fields, 'similarity')[:limit])
+
+
+def get_limited_suggestions(using, queryset, query, fields, limit):
+    '''
+        get_suggestions from the `using` database, cancelled once it exceeds the latency budget
+    '''
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute('SET LOCAL statement_timeout = %s', [settings.AUTOCOMPLETE_STATEMENT_TIMEOUT])
+            cursor.execute('SET LOCAL pg_trgm.word_similarity_threshold = %s',
+                           [settings.AUTOCOMPLETE_SIMILARITY_THRESHOLD])
+            suggestions = get_suggestions(queryset.using(using), query, fields, limit)
+            # SET LOCAL lasts until the end of the outer transaction, the whole request with ATOMIC_REQUESTS,
+            # so reset them once the query is done, a cancelled query rolls them back with the savepoint instead
+            cursor.execute('RESET statement_timeout')
+            cursor.execute('RESET pg_trgm.word_similarity_threshold')
+    return suggestions
+
+
+def top_suggestions(suggestions, fields, limit):
+    suggestions = sorted(suggestions, key=lambda suggestion: (-suggestion['similarity'], suggestion['id']))
+    return [{field: suggestion[field] for field in fields} for suggestion in suggestions[:limit]]
+
+
+def suggest(query):
+    '''
+        Top suggestions of restaurants and items names, hot queries are served from an in-process cache
+        and the database queries are cancelled once they exceed the latency budget,
+        the items are looked up on every shard
+    '''
+    query = normalize_query(query)
+    suggestions = suggestions_cache.get(query)
+    if suggestions is not None:
+        return suggestions
+
+    limit = settings.AUTOCOMPLETE_LIMIT
+    restaurant_fields, item_fields = ('id', 'name'), ('id', 'name', 'restaurant')
+    try:
+        restaurants = get_limited_suggestions(DEFAULT_DB_ALIAS, Restaurant.objects.all(), query, restaurant_fields,
+                                              limit)
+        items = [item for using in settings.RESTAURANT_SHARDS
+                 for item in get_limited_suggestions(using, Item.objects.all(), query, item_fields, limit)]
+    except DatabaseError:
+        logger.warning('Autocomplete of "%s" exceeded its latency budget', query)
+        return {'restaurants': [], 'items': []}
+    suggestions = {
+        'restaurants': top_suggestions(restaurants, restaurant_fields, limit),
+        'items': top_suggestions(items, item_fields, limit),
+    }
+    suggestions_cache.set(query, suggestions)
+    return suggestions
@@ -0,0 +1,154 @@
+import json
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def order_channel(order_id):
+    return 'orders:{}'.format(order_id)
+
+
+def restaurant_channel(restaurant_id):
+    return 'restaurants:{}:orders'.format(restaurant_id)
+
+
+class RedisBroker:
+    '''
+        Fan out the events to every gunicorn worker/server through redis pub/sub
+    '''
+
+    def __init__(self, url=None):
+        import redis
+
+        self.redis = redis.StrictRedis.from_url(url or settings.ORDER_EVENTS_REDIS_URL)
+
+    def publish(self, channels, message):
+        pipeline = self.redis.pipeline(transaction=False)
+        for channel in channels:
+            pipeline.publish(channel, message)
+        pipeline.execute()
+
+    def subscribe(self, channels):
+        return RedisSubscription(self.redis, channels)
+
+
+class RedisSubscription:
+
+    def __init__(self, redis, channels):
+        self.pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(*channels)
+
+    def get(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            message = self.pubsub.get_message(timeout=remaining)
+            if message and message['type'] == 'message':
+                data = message['data']
+                return data.decode() if isinstance(data, bytes) else data
+
+    def close(self):
+        self.pubsub.close()
+
+
+class InMemoryBroker:
+    '''
+        In process stand-in for the redis broker, it only reaches the subscribers of the same process
+        so it's meant for tests and the local runserver
+    '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def publish(self, channels, message):
+        with self.lock:
+            subscribers = {subscriber for channel in channels for subscriber in self.subscribers.get(channel, ())}
+        for subscriber in subscribers:
+            subscriber.queue.put(message)
+
+    def subscribe(self, channels):
+        subscription = InMemorySubscription(self, channels)
+        with self.lock:
+            for channel in channels:
+                self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers.get(channel, set()).discard(subscription)
+
+
+class InMemorySubscription:
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.queue = queue.Queue()
+
+    def get(self, timeout):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(settings.ORDER_EVENTS_BROKER)()
+    return _broker
+
+
+def publish_order_status(order):
+    '''
+        Publish the new status of the order to its channel and its restaurant's channel
+        once the current transaction is committed
+    '''
+    from .serializers import OrderStatusSerializer
+
+    message = json.dumps(OrderStatusSerializer(order).data, cls=JSONEncoder)
+    channels = [order_channel(order.pk), restaurant_channel(order.restaurant_id)]
+    transaction.on_commit(lambda: get_broker().publish(channels, message), using=order._state.db)
+
+
+def event_stream(subscription, heartbeat=None, timeout=None):
+    '''
+        Yield the published messages as server-sent events, with a comment line every heartbeat seconds
+        to keep proxies from closing the connection, the stream ends after timeout seconds
+        and the EventSource client reconnects on its own
+    '''
+    heartbeat = heartbeat or settings.ORDER_EVENTS_HEARTBEAT
+    deadline = time.monotonic() + (timeout or settings.ORDER_EVENTS_STREAM_TIMEOUT)
+    # the transaction of the request is over once the stream starts,
+    # so don't hold its database connections for the minutes the stream lasts
+    for connection in connections.all():
+        if not connection.in_atomic_block:
+            connection.close()
+    try:
+        yield ': connected\n\n'
+        while time.monotonic() < deadline:
+            message = subscription.get(timeout=min(heartbeat, max(deadline - time.monotonic(), 0)))
+            if message is None:
+                yield ': heartbeat\n\n'
+            else:
+                yield 'event: status\ndata: {}\n\n'.format(message)
+    finally:
+        subscription.close()
@@ -0,0 +1,15 @@
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('The resource was changed by another request.')
+    default_code = 'conflict'
+
+
+class RestaurantMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The restaurant is being moved, try again in a minute.')
+    default_code = 'restaurant_moving'
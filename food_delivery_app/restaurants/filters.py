@@ -1,9 +1,51 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F
 from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
 
-from .models import Order
+from .models import Order, Item
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class OrderFilter(filters.FilterSet):
+    status__in = NumberInFilter(field_name='status', lookup_expr='in')
+    active = filters.BooleanFilter(method='filter_active')
+    created = filters.DateTimeFromToRangeFilter()
+    delivered_at = filters.DateTimeFromToRangeFilter()
+    ordering = filters.OrderingFilter(fields=('created', 'delivered_at', 'status', 'total_price'))
+
     class Meta:
         model = Order
         fields = ['customer', 'status']
+
+    def filter_active(self, queryset, name, value):
+        '''
+            Active orders are the ones that are neither delivered nor cancelled,
+            `status < DELIVERED` matches the predicate of the order_active_idx partial index
+        '''
+        if value:
+            return queryset.filter(status__lt=Order.DELIVERED)
+        return queryset.filter(status__gte=Order.DELIVERED)
+
+
+class ItemSearchFilter(BaseFilterBackend):
+    '''
+        Full-text search over the item's name, category name and short description,
+        matched against the GIN indexed search_vector and ordered by rank
+    '''
+    search_param = 'search'
+
+    def get_search_terms(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        query = SearchQuery(search_terms, config=Item.SEARCH_CONFIG)
+        return (queryset.filter(search_vector=query)
+                .annotate(rank=SearchRank(F('search_vector'), query))
+                .order_by('-rank', '-id'))
@@ -0,0 +1,106 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from food_delivery_app.core.utils import bulk_update_field
+
+from .menu import menu_changed
+from .models import Restaurant, Category, ItemSize, Item, ItemSizeDetails
+from .sharding import get_restaurant_shard, restaurant_context
+
+
+class MenuImporter:
+    '''
+        Upsert a validated menu of a restaurant with bulk queries in one transaction,
+        categories and sizes are matched by name and items by category and name, only the missing ones are created
+        and the descriptions and prices of the existing ones are updated. The existing items that changed
+        are touched, their modified field is what the ETag and Last-Modified of the items are computed from
+    '''
+
+    def __init__(self, restaurant):
+        self.restaurant = restaurant
+
+    def get_or_create_by_name(self, model, names):
+        # the names aren't unique, a name that was created twice through the API resolves to its oldest row
+        objects = {obj.name: obj
+                   for obj in model.objects.filter(restaurant=self.restaurant, name__in=names).order_by('-pk')}
+        new_objects = model.objects.bulk_create(
+            [model(restaurant=self.restaurant, name=name) for name in sorted(set(names) - set(objects))]
+        )
+        objects.update((obj.name, obj) for obj in new_objects)
+        return objects, len(new_objects)
+
+    def upsert_items(self, categories, items_data):
+        existing_items = {
+            (item.category_id, item.name): item
+            for item in (Item.objects.filter(restaurant=self.restaurant, name__in={item['name'] for item in items_data})
+                         .defer('search_vector'))
+        }
+        items, new_items, updated_descriptions = [], [], {}
+        for item_data in items_data:
+            category = categories[item_data['category']]
+            item = existing_items.get((category.pk, item_data['name']))
+            if item is None:
+                item = Item(restaurant=self.restaurant, category=category, name=item_data['name'],
+                            short_description=item_data['short_description'])
+                new_items.append(item)
+            elif item.short_description != item_data['short_description']:
+                updated_descriptions[item.pk] = item_data['short_description']
+            items.append(item)
+
+        Item.objects.bulk_create(new_items)
+        bulk_update_field(Item.objects.filter(restaurant=self.restaurant), 'short_description', updated_descriptions,
+                          modified=timezone.now())
+        return items, new_items, len(updated_descriptions)
+
+    def upsert_size_details(self, sizes, items, new_items, items_data):
+        new_item_ids = {item.pk for item in new_items}
+        existing_details = {
+            (size_details.item_id, size_details.size_id): size_details
+            for size_details in ItemSizeDetails.objects.filter(
+                item__in=[item.pk for item in items if item.pk not in new_item_ids])
+        }
+        new_details, updated_prices, changed_item_ids = [], {}, set()
+        for item, item_data in zip(items, items_data):
+            for size in item_data['sizes']:
+                size_details = existing_details.get((item.pk, sizes[size['size']].pk))
+                if size_details is None:
+                    new_details.append(ItemSizeDetails(item=item, size=sizes[size['size']], price=size['price']))
+                elif size_details.price != size['price']:
+                    updated_prices[size_details.pk] = size['price']
+                else:
+                    continue
+                changed_item_ids.add(item.pk)
+
+        ItemSizeDetails.objects.bulk_create(new_details)
+        bulk_update_field(ItemSizeDetails.objects.all(), 'price', updated_prices)
+        changed_item_ids -= new_item_ids
+        if changed_item_ids:
+            Item.objects.filter(pk__in=changed_item_ids).update(modified=timezone.now())
+        return len(new_details), len(updated_prices)
+
+    def import_menu(self, data):
+        # the menu is written to the shard of the restaurant in one transaction, the concurrent imports
+        # of the restaurant wait on the lock of its row so they don't both create the same items
+        using = get_restaurant_shard(self.restaurant.pk)
+        with restaurant_context(self.restaurant.pk), transaction.atomic(using=DEFAULT_DB_ALIAS), \
+                transaction.atomic(using=using):
+            Restaurant.objects.using(DEFAULT_DB_ALIAS).select_for_update().get(pk=self.restaurant.pk)
+
+            items_data = data['items']
+            category_names = set(data.get('categories', [])) | {item['category'] for item in items_data}
+            size_names = set(data.get('sizes', [])) | {size['size'] for item in items_data for size in item['sizes']}
+            categories, created_categories = self.get_or_create_by_name(Category, category_names)
+            sizes, created_sizes = self.get_or_create_by_name(ItemSize, size_names)
+            items, new_items, updated_items = self.upsert_items(categories, items_data)
+            created_size_details, updated_size_details = self.upsert_size_details(sizes, items, new_items, items_data)
+
+            # bulk queries don't send the signals that rebuild the menu
+            menu_changed(self.restaurant.pk, using=using)
+            return {
+                'categories': created_categories,
+                'item_sizes': created_sizes,
+                'items': len(new_items),
+                'item_size_details': created_size_details,
+                'updated_items': updated_items,
+                'updated_item_size_details': updated_size_details,
+            }
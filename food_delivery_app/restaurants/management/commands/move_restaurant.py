@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from food_delivery_app.restaurants.models import Restaurant
+from food_delivery_app.restaurants.sharding import move_restaurant
+
+
+class Command(BaseCommand):
+    help = 'Move the menu and the orders of a restaurant to another shard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('restaurant_id', type=int)
+        parser.add_argument('shard', help='One of the aliases of RESTAURANT_SHARDS')
+        parser.add_argument('--wait', type=float, default=settings.RESTAURANT_SHARD_LOCAL_CACHE_TTL,
+                            help='Seconds to wait for the requests in flight and the in-process caches of the shard')
+        parser.add_argument('--keep-source', action='store_true',
+                            help="Don't delete the rows of the restaurant from the shard it's moved from")
+
+    def handle(self, *args, **options):
+        shard = options['shard']
+        if shard not in settings.RESTAURANT_SHARDS:
+            raise CommandError('Unknown shard "{}", the shards are {}'.format(
+                shard, ', '.join(settings.RESTAURANT_SHARDS)))
+        restaurant = Restaurant.objects.using(DEFAULT_DB_ALIAS).filter(pk=options['restaurant_id']).first()
+        if restaurant is None:
+            raise CommandError('Restaurant {} does not exist'.format(options['restaurant_id']))
+        if restaurant.shard == shard:
+            raise CommandError('Restaurant {} is on {} already'.format(restaurant.pk, shard))
+
+        source = restaurant.shard
+        copied = move_restaurant(restaurant, shard, wait=options['wait'], delete_source=not options['keep_source'])
+        for label, count in copied.items():
+            self.stdout.write('{}: {}'.format(label, count))
+        self.stdout.write(self.style.SUCCESS('Moved restaurant {} from {} to {}'.format(restaurant.pk, source, shard)))
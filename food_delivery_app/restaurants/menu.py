@@ -0,0 +1,173 @@
+import gzip
+import time
+import weakref
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.utils import timezone, translation
+from rest_framework.renderers import JSONRenderer
+
+from food_delivery_app.core.tasks import run_in_background
+
+from .models import Restaurant, Category, Item, ItemSizeDetails, MenuSnapshot
+from .sharding import restaurant_context, wait_for_restaurant_move
+
+
+def menu_version_key(restaurant_id):
+    return 'restaurants:{}:menu-version'.format(restaurant_id)
+
+
+def menu_rebuild_key(restaurant_id):
+    return 'restaurants:{}:menu-rebuild'.format(restaurant_id)
+
+
+def get_menu_version(restaurant_id):
+    '''
+        The version starts from the current time in milliseconds, so if the key is evicted
+        the new version is still newer than the snapshots rendered before the eviction
+    '''
+    key = menu_version_key(restaurant_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_menu_version(restaurant_id):
+    key = menu_version_key(restaurant_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, None)
+        return version
+
+
+def get_menu_categories(restaurant_id):
+    '''
+        Fetch the whole menu in three queries: categories, items and item sizes with their names
+    '''
+    items = Item.objects.filter(restaurant_id=restaurant_id).defer('search_vector').order_by('name', 'id')
+    size_details = ItemSizeDetails.objects.select_related('size').order_by('price', 'id')
+    return (Category.objects.filter(restaurant_id=restaurant_id).order_by('name')
+            .prefetch_related(Prefetch('items', queryset=items),
+                              Prefetch('items__size_details', queryset=size_details)))
+
+
+def build_menu(restaurant):
+    from .serializers import MenuCategorySerializer
+
+    return {
+        'id': restaurant.pk,
+        'name': restaurant.name,
+        'logo': restaurant.logo.url if restaurant.logo else None,
+        'categories': MenuCategorySerializer(get_menu_categories(restaurant.pk), many=True).data,
+    }
+
+
+def get_menu_locale():
+    locale = translation.get_language()
+    return locale if locale in settings.MENU_SNAPSHOT_LOCALES else settings.MENU_SNAPSHOT_LOCALES[0]
+
+
+def get_menu_snapshot(restaurant_id, locale, fields=('content',)):
+    '''
+        The snapshot of the restaurant's menu with a single indexed lookup of the given fields only,
+        None if it isn't built yet. A snapshot older than the menu version is still returned but rebuilt
+        in the background, in case the rebuild scheduled by the change was lost
+    '''
+    snapshot = (MenuSnapshot.objects.filter(restaurant_id=restaurant_id, locale=locale)
+                .only('version', *fields).first())
+    if snapshot is not None and snapshot.version < get_menu_version(restaurant_id):
+        schedule_menu_rebuild(int(restaurant_id))
+    return snapshot
+
+
+def menu_export_path(restaurant_id, locale, version):
+    return 'menus/{}/{}/{}.json.gz'.format(restaurant_id, locale, version)
+
+
+def publish_menu(restaurant_id, locale, version, content):
+    '''
+        Write the gzipped menu to the media storage under a path that never changes its content,
+        so the CDN can cache it forever, S3 serves it with the gzip Content-Encoding guessed from the name
+    '''
+    path = menu_export_path(restaurant_id, locale, version)
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(gzip.compress(content)))
+    return path
+
+
+def save_menu_snapshot(restaurant_id, locale, content, version, export_path=''):
+    updated = (MenuSnapshot.objects.filter(restaurant_id=restaurant_id, locale=locale, version__lte=version)
+               .update(content=content, version=version, export_path=export_path, modified=timezone.now()))
+    if updated or MenuSnapshot.objects.filter(restaurant_id=restaurant_id, locale=locale).exists():
+        return
+    try:
+        with transaction.atomic():
+            MenuSnapshot.objects.create(restaurant_id=restaurant_id, locale=locale, content=content, version=version,
+                                        export_path=export_path)
+    except IntegrityError:
+        # created by a concurrent rebuild
+        pass
+
+
+def rebuild_menu_snapshot(restaurant, locale):
+    '''
+        Render the menu of the restaurant for the locale, publish it and store it, returns the snapshot
+    '''
+    # read the version before the rows, so the snapshot is at least as new as the version it's saved with
+    version = get_menu_version(restaurant.pk)
+    with restaurant_context(restaurant.pk):
+        with translation.override(locale):
+            content = JSONRenderer().render(build_menu(restaurant))
+        export_path = publish_menu(restaurant.pk, locale, version, content) if settings.MENU_EXPORT_ENABLED else ''
+        save_menu_snapshot(restaurant.pk, locale, content, version, export_path)
+    return MenuSnapshot(restaurant=restaurant, locale=locale, content=content, version=version,
+                        export_path=export_path)
+
+
+def rebuild_menu_snapshots(restaurant_id):
+    wait_for_restaurant_move(restaurant_id)
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).first()
+    if restaurant is None:
+        return
+    for locale in settings.MENU_SNAPSHOT_LOCALES:
+        rebuild_menu_snapshot(restaurant, locale)
+
+
+def schedule_menu_rebuild(restaurant_id):
+    '''
+        Rebuild the snapshots of a stale menu in the background, at most once per MENU_REBUILD_TIMEOUT
+        so the reads of the menu meanwhile don't schedule it again
+    '''
+    if cache.add(menu_rebuild_key(restaurant_id), True, settings.MENU_REBUILD_TIMEOUT):
+        run_in_background(rebuild_menu_snapshots, restaurant_id)
+
+
+def menu_committed(restaurant_id):
+    bump_menu_version(restaurant_id)
+    cache.set(menu_rebuild_key(restaurant_id), True, settings.MENU_REBUILD_TIMEOUT)
+    run_in_background(rebuild_menu_snapshots, restaurant_id)
+
+
+def menu_changed(restaurant_id, using=None):
+    '''
+        Once the current transaction of the database the menu changed in is committed
+        bump the menu version of the restaurant and rebuild its snapshots in the background,
+        it's scheduled once per transaction however many rows of the menu changed
+    '''
+    connection = transaction.get_connection(using)
+    # only weakly referenced, so a callback is dropped from it once it ran
+    # or once the transaction or the savepoint it was scheduled in is rolled back
+    scheduled = connection.__dict__.setdefault('scheduled_menu_changes', weakref.WeakValueDictionary())
+    if restaurant_id not in scheduled:
+        callback = partial(menu_committed, restaurant_id)
+        scheduled[restaurant_id] = callback
+        transaction.on_commit(callback, using=using)
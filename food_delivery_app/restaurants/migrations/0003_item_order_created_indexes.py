@@ -0,0 +1,39 @@
+# Generated by Django 2.1.2 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('restaurants', '0002_auto_20181223_1658'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='item',
+                    index=models.Index(fields=['restaurant', 'created', 'id'], name='item_restaurant_created_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='order',
+                    index=models.Index(fields=['restaurant', 'created', 'id'], name='order_restaurant_created_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "item_restaurant_created_idx" '
+                    'ON "restaurants_item" ("restaurant_id", "created", "id");',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "item_restaurant_created_idx";',
+                ),
+                migrations.RunSQL(
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "order_restaurant_created_idx" '
+                    'ON "restaurants_order" ("restaurant_id", "created", "id");',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "order_restaurant_created_idx";',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.1.2 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('restaurants', '0003_item_order_created_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='order',
+                    index=models.Index(fields=['restaurant', 'status', '-created'], name='order_restaurant_status_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='order',
+                    index=models.Index(fields=['restaurant', 'delivered_at'], name='order_restaurant_delivered_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "order_restaurant_status_idx" '
+                    'ON "restaurants_order" ("restaurant_id", "status", "created" DESC);',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "order_restaurant_status_idx";',
+                ),
+                migrations.RunSQL(
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "order_restaurant_delivered_idx" '
+                    'ON "restaurants_order" ("restaurant_id", "delivered_at");',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "order_restaurant_delivered_idx";',
+                ),
+            ],
+        ),
+        # Partial indexes can't be declared in Meta.indexes before Django 2.2
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS "order_active_idx" '
+            'ON "restaurants_order" ("restaurant_id", "created" DESC) WHERE "status" < 5;',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "order_active_idx";',
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 2.1.2 on 2026-10-18 16:56
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+ITEM_SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION restaurants_item_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT name FROM restaurants_category WHERE id = NEW.category_id), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.short_description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER restaurants_item_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, short_description, category_id ON restaurants_item
+    FOR EACH ROW EXECUTE PROCEDURE restaurants_item_search_vector_update();
+
+-- a renamed category re-triggers the search vector update of its items
+CREATE FUNCTION restaurants_category_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    IF NEW.name IS DISTINCT FROM OLD.name THEN
+        UPDATE restaurants_item SET category_id = category_id WHERE category_id = NEW.id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER restaurants_category_search_vector_trigger
+    AFTER UPDATE OF name ON restaurants_category
+    FOR EACH ROW EXECUTE PROCEDURE restaurants_category_search_vector_update();
+"""
+
+DROP_ITEM_SEARCH_VECTOR_TRIGGER = """
+DROP TRIGGER IF EXISTS restaurants_category_search_vector_trigger ON restaurants_category;
+DROP FUNCTION IF EXISTS restaurants_category_search_vector_update();
+DROP TRIGGER IF EXISTS restaurants_item_search_vector_trigger ON restaurants_item;
+DROP FUNCTION IF EXISTS restaurants_item_search_vector_update();
+"""
+
+# the trigger fills the search vector of the updated items, returns the last id of the batch
+BACKFILL_SEARCH_VECTOR_SQL = """
+WITH updated AS (
+    UPDATE restaurants_item SET name = name
+    WHERE id IN (SELECT id FROM restaurants_item WHERE id > %s ORDER BY id LIMIT %s)
+    RETURNING id
+)
+SELECT MAX(id) FROM updated
+"""
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_search_vectors(apps, schema_editor):
+    '''
+        Fill the search vector of the existing items in batches committed one by one,
+        so the rows aren't all locked until the end of the migration
+    '''
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        while True:
+            cursor.execute(BACKFILL_SEARCH_VECTOR_SQL, [last_id, BACKFILL_BATCH_SIZE])
+            last_id = cursor.fetchone()[0]
+            if last_id is None:
+                break
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction and the backfill commits every batch
+    atomic = False
+
+    dependencies = [
+        ('restaurants', '0004_order_dashboard_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunSQL(ITEM_SEARCH_VECTOR_TRIGGER, reverse_sql=DROP_ITEM_SEARCH_VECTOR_TRIGGER),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='item',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'],
+                                                                   name='item_search_vector_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "item_search_vector_idx" '
+                    'ON "restaurants_item" USING gin ("search_vector");',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "item_search_vector_idx";',
+                ),
+            ],
+        ),
+    ]
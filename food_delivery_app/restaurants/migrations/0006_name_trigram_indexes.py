@@ -0,0 +1,28 @@
+# Generated by Django 2.1.2 on 2026-10-18 17:02
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('restaurants', '0005_item_search_vector'),
+    ]
+
+    # GinIndex can't take an operator class before Django 2.2
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS "restaurant_name_trgm_idx" '
+            'ON "restaurants_restaurant" USING gin ("name" gin_trgm_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "restaurant_name_trgm_idx";',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS "item_name_trgm_idx" '
+            'ON "restaurants_item" USING gin ("name" gin_trgm_ops);',
+            reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "item_name_trgm_idx";',
+        ),
+    ]
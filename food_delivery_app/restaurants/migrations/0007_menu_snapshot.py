@@ -0,0 +1,36 @@
+# Generated by Django 2.1.2 on 2026-10-18 17:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0006_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('locale', models.CharField(max_length=16)),
+                ('content', models.BinaryField()),
+                ('version', models.BigIntegerField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='menu_snapshots', to='restaurants.Restaurant')),
+            ],
+            options={
+                'ordering': ('-modified', '-created'),
+                'get_latest_by': 'modified',
+                'abstract': False,
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='menusnapshot',
+            unique_together={('restaurant', 'locale')},
+        ),
+    ]
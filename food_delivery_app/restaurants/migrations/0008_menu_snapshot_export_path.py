@@ -0,0 +1,18 @@
+# Generated by Django 2.1.2 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0007_menu_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menusnapshot',
+            name='export_path',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
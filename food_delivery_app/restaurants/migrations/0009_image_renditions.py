@@ -0,0 +1,24 @@
+# Generated by Django 2.1.2 on 2026-10-18 18:30
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0008_menu_snapshot_export_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='image_renditions',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='logo_renditions',
+            field=django.contrib.postgres.fields.jsonb.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.1.2 on 2026-10-18 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import food_delivery_app.restaurants.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0009_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='shard',
+            field=models.CharField(default=food_delivery_app.restaurants.models.new_restaurant_shard, editable=False, max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='restaurant',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='categories', to='restaurants.Restaurant'),
+        ),
+        migrations.AlterField(
+            model_name='item',
+            name='restaurant',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='items', to='restaurants.Restaurant'),
+        ),
+        migrations.AlterField(
+            model_name='itemsize',
+            name='restaurant',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='item_sizes', to='restaurants.Restaurant'),
+        ),
+        migrations.AlterField(
+            model_name='menusnapshot',
+            name='restaurant',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='menu_snapshots', to='restaurants.Restaurant'),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='customer',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='restaurant',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='restaurants.Restaurant'),
+        ),
+    ]
@@ -0,0 +1,134 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, urlencode
+from rest_framework import permissions
+from rest_framework.generics import get_object_or_404
+
+from food_delivery_app.core.cache import get_entry, set_entry, get_or_compute, release_lock
+from food_delivery_app.core.db_routers import read_from_replica
+
+from .exceptions import RestaurantMoving
+from .menu import get_menu_version
+from .models import Restaurant
+from .sharding import set_current_restaurant, is_restaurant_moving
+
+
+def restaurant_cache_key(restaurant_id):
+    return 'restaurants:{}:row'.format(restaurant_id)
+
+
+def response_cache_key(restaurant_id, version, request):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    uri = '{}?{}|{}'.format(request.build_absolute_uri(request.path), query, request.accepted_media_type)
+    return 'restaurants:{}:responses:{}:{}'.format(restaurant_id, version, hashlib.md5(uri.encode()).hexdigest())
+
+
+def get_restaurant_or_404(restaurant_id):
+    '''
+        The restaurant row is kept in the shared cache for RESTAURANT_CACHE_TIMEOUT seconds if it's set,
+        it's deleted from there whenever the restaurant is saved or deleted
+    '''
+    timeout = settings.RESTAURANT_CACHE_TIMEOUT
+    if not timeout:
+        return get_object_or_404(Restaurant, pk=restaurant_id)
+    return get_or_compute(restaurant_cache_key(restaurant_id),
+                          lambda: get_object_or_404(Restaurant, pk=restaurant_id), timeout)
+
+
+class RestaurantShardMixin:
+    '''
+        Route the queries of the request to the shard of the restaurant of the URL, if any,
+        and refuse to write to it while it's being moved to another shard
+    '''
+    restaurant_url_kwarg = 'restaurant_id'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        restaurant_id = str(self.kwargs.get(self.restaurant_url_kwarg, ''))
+        if restaurant_id.isdigit():
+            if request.method not in permissions.SAFE_METHODS and is_restaurant_moving(restaurant_id):
+                raise RestaurantMoving()
+            set_current_restaurant(int(restaurant_id))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        set_current_restaurant(None)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class RestaurantNestedMixin(RestaurantShardMixin):
+    '''
+        For the viewsets nested under restaurants/{restaurant_id}/, the restaurant is resolved once per request
+        and shared by the queryset, the permissions and the serializers' RestaurantDefault
+    '''
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # answer 404 for an unknown restaurant before doing anything else
+        self.get_restaurant()
+
+    def get_restaurant(self):
+        if not hasattr(self, '_restaurant'):
+            self._restaurant = get_restaurant_or_404(self.kwargs[self.restaurant_url_kwarg])
+        return self._restaurant
+
+
+class CachedResponseMixin:
+    '''
+        Keep the rendered JSON of list/retrieve in the shared cache for RESTAURANT_RESPONSE_CACHE_TIMEOUT seconds
+        if it's set, under the menu version of the restaurant, which is bumped whenever its menu changes,
+        so the hits skip the queries, the serializers and the renderer. A single worker renders
+        a missing or expiring response, see core.cache.get_entry
+    '''
+    cached_headers = ('ETag', 'Last-Modified')
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, view, request, *args, **kwargs):
+        timeout = settings.RESTAURANT_RESPONSE_CACHE_TIMEOUT
+        # the browsable API shows the user, so only the JSON is shared
+        if not timeout or request.accepted_renderer.format != 'json':
+            return view(request, *args, **kwargs)
+
+        restaurant_id = self.get_restaurant().pk
+        key = response_cache_key(restaurant_id, get_menu_version(restaurant_id), request)
+        cached, recompute = get_entry(key)
+        if not recompute:
+            content, content_type, headers = cached
+            # like ConditionalGetMixin, the lists are only validated by their ETag
+            last_modified = None
+            if self.action == 'retrieve':
+                last_modified = parse_http_date_safe(headers.get('Last-Modified', ''))
+            response = get_conditional_response(request, etag=headers.get('ETag'), last_modified=last_modified)
+            if response is None:
+                response = HttpResponse(content, content_type=content_type)
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        # render the misses from the primary, so a lagging replica can't cache old rows under the new version
+        read_from_replica(False)
+        started_at = time.monotonic()
+        try:
+            response = view(request, *args, **kwargs)
+        except BaseException:
+            release_lock(key)
+            raise
+        if response.status_code != 200:
+            release_lock(key)
+            return response
+
+        def cache_response(response):
+            headers = {header: response[header] for header in self.cached_headers if response.has_header(header)}
+            set_entry(key, (response.content, response['Content-Type'], headers), timeout,
+                      time.monotonic() - started_at)
+
+        response.add_post_render_callback(cache_response)
+        return response
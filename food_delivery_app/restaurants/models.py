@@ -1,7 +1,12 @@
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F, Sum
 from django.utils.translation import ugettext_lazy as _
 from django.core.validators import RegexValidator
 from django.conf import settings
+from django.utils import timezone
 
 from django_extensions.db.models import TimeStampedModel
 
@@ -9,11 +14,15 @@ from food_delivery_app.core.utils import media_file_name
 
 
 def item_images(instance, filename):
-    return media_file_name('items', 'restaurant_id')(instance, filename)
+    return media_file_name('items', 'restaurant_id', 'image')(instance, filename)
 
 
 def restaurant_images(instance, filename):
-    return media_file_name('restaurant', 'owner_id')(instance, filename)
+    return media_file_name('restaurant', 'owner_id', 'logo')(instance, filename)
+
+
+def new_restaurant_shard():
+    return settings.RESTAURANT_NEW_SHARD
 
 
 phone_regex = RegexValidator(regex=r'^\+?1?\d{9,15}$',
@@ -27,13 +36,22 @@ class Restaurant(TimeStampedModel):
     phone = models.CharField(_('Phone'), validators=[phone_regex], max_length=128)
     address = models.CharField(_('Address'), max_length=128)
     logo = models.ImageField(_('Logo'), upload_to=restaurant_images, blank=True, null=True)
+    # resized copies of the logo made in the background, see core.images
+    logo_renditions = JSONField(default=dict, blank=True, editable=False)
+    # database alias holding the menu and the orders of the restaurant, see sharding
+    shard = models.CharField(max_length=32, default=new_restaurant_shard, editable=False)
 
     def __str__(self):
         return self.name
 
 
+# The models below live on the shard of their restaurant while the restaurants and the users live on the primary,
+# so their foreign keys to those have no database constraints
+
+
 class Category(TimeStampedModel):
-    restaurant = models.ForeignKey("Restaurant", related_name='categories', on_delete=models.CASCADE)
+    restaurant = models.ForeignKey("Restaurant", related_name='categories', on_delete=models.CASCADE,
+                                   db_constraint=False)
     name = models.CharField(_('Name'), max_length=128)
 
     class Meta:
@@ -46,7 +64,8 @@ class Category(TimeStampedModel):
 
 
 class ItemSize(TimeStampedModel):
-    restaurant = models.ForeignKey("Restaurant", related_name='item_sizes', on_delete=models.CASCADE)
+    restaurant = models.ForeignKey("Restaurant", related_name='item_sizes', on_delete=models.CASCADE,
+                                   db_constraint=False)
     name = models.CharField(_('Name'), max_length=128)
 
     class Meta:
@@ -59,12 +78,25 @@ class ItemSize(TimeStampedModel):
 
 
 class Item(TimeStampedModel):
-    restaurant = models.ForeignKey("Restaurant", related_name='items', on_delete=models.CASCADE)
+    restaurant = models.ForeignKey("Restaurant", related_name='items', on_delete=models.CASCADE,
+                                   db_constraint=False)
     category = models.ForeignKey("Category", related_name='items', on_delete=models.PROTECT)
     sizes = models.ManyToManyField("ItemSize", related_name='items', through='ItemSizeDetails')
     name = models.CharField(max_length=128)
     short_description = models.CharField(max_length=128)
     image = models.ImageField(upload_to=item_images, null=True, blank=True)
+    # resized copies of the image made in the background, see core.images
+    image_renditions = JSONField(default=dict, blank=True, editable=False)
+    # maintained by database triggers from name, short_description and category name, see migration 0005
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    SEARCH_CONFIG = 'english'
+
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            models.Index(fields=['restaurant', 'created', 'id'], name='item_restaurant_created_idx'),
+            GinIndex(fields=['search_vector'], name='item_search_vector_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -82,6 +114,27 @@ class ItemSizeDetails(models.Model):
         return str(self.id)
 
 
+class MenuSnapshot(TimeStampedModel):
+    '''
+        The whole menu of a restaurant rendered as JSON for a locale,
+        rebuilt in the background whenever the menu changes and served as is
+    '''
+    restaurant = models.ForeignKey("Restaurant", related_name='menu_snapshots', on_delete=models.CASCADE,
+                                   db_constraint=False)
+    locale = models.CharField(max_length=16)
+    content = models.BinaryField()
+    # menu version the snapshot was rendered at, an older rebuild never overwrites a newer one
+    version = models.BigIntegerField()
+    # gzipped copy of the content published to the media storage, blank if publishing is disabled
+    export_path = models.CharField(max_length=255, blank=True)
+
+    class Meta(TimeStampedModel.Meta):
+        unique_together = ('restaurant', 'locale')
+
+    def __str__(self):
+        return '{} ({})'.format(self.restaurant_id, self.locale)
+
+
 class Order(TimeStampedModel):
     PICKED = 1
     COOKING = 2
@@ -97,9 +150,17 @@ class Order(TimeStampedModel):
         (DELIVERED, _("Delivered")),
         (CANCELLED, _("Candelled")),
     )
-
-    customer = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='orders', on_delete=models.CASCADE)
-    restaurant = models.ForeignKey("Restaurant", related_name='orders', on_delete=models.CASCADE)
+    STATUS_TIMESTAMP_FIELDS = {
+        COOKING: 'cooked_at',
+        READY: 'ready_at',
+        ONTHEWAY: 'on_the_way_at',
+        DELIVERED: 'delivered_at',
+    }
+
+    customer = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='orders', on_delete=models.CASCADE,
+                                 db_constraint=False)
+    restaurant = models.ForeignKey("Restaurant", related_name='orders', on_delete=models.CASCADE,
+                                   db_constraint=False)
     items_sizes = models.ManyToManyField("ItemSizeDetails", related_name="orders", through='ItemOrderDetails')
     address = models.CharField(max_length=500)
     status = models.IntegerField(choices=STATUS_CHOICES, default=PICKED)
@@ -111,6 +172,13 @@ class Order(TimeStampedModel):
     on_the_way_at = models.DateTimeField(blank=True, null=True)
     delivered_at = models.DateTimeField(blank=True, null=True)
 
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            models.Index(fields=['restaurant', 'created', 'id'], name='order_restaurant_created_idx'),
+            models.Index(fields=['restaurant', 'status', '-created'], name='order_restaurant_status_idx'),
+            models.Index(fields=['restaurant', 'delivered_at'], name='order_restaurant_delivered_idx'),
+        ]
+
     def __str__(self):
         return str(self.id)
 
@@ -120,10 +188,33 @@ class Order(TimeStampedModel):
             use total_price field instead of this method
             we use this method to save/update total_price field when the order is created/updated
         '''
-        total = 0
-        for order_detail in self.orders_details.all():
-            total += order_detail.get_total_items_price()
-        return total
+        total = self.orders_details.aggregate(total=Sum(F('item_size__price') * F('count')))['total']
+        return total or 0
+
+    def transition_status(self, new_status):
+        '''
+            Move the order from its current status to new_status with a single conditional UPDATE
+            that only touches the status and its timestamp column,
+            returns False if the status was changed by another request in the meantime
+        '''
+        values = {'status': new_status}
+        timestamp_field = self.STATUS_TIMESTAMP_FIELDS.get(new_status)
+        if timestamp_field:
+            values[timestamp_field] = timezone.now()
+        updated = Order.objects.filter(pk=self.pk, status=self.status).update(**values)
+        if not updated:
+            return False
+        for field, value in values.items():
+            setattr(self, field, value)
+        return True
+
+    @staticmethod
+    def calculate_total_price(items_sizes):
+        '''
+            Calculate the total price of validated order lines in memory,
+            every line's item_size is expected to be already fetched with its price
+        '''
+        return sum(item_size['item_size'].price * item_size.get('count', 1) for item_size in items_sizes)
 
 
 class ItemOrderDetails(models.Model):
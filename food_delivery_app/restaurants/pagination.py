@@ -0,0 +1,51 @@
+from rest_framework import pagination
+from rest_framework.exceptions import ValidationError
+
+
+class CreatedCursorPagination(pagination.CursorPagination):
+    '''
+        Keyset pagination over (created, id) from TimeStampedModel, pages are fetched with
+        `WHERE created < <cursor position>` instead of an OFFSET and without counting the rows,
+        an empty cursor (`?cursor=`) asks for the first page
+    '''
+    ordering = ('-created', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def decode_cursor(self, request):
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super().decode_cursor(request)
+
+
+class CursorOrLimitOffsetPagination(pagination.BasePagination):
+    '''
+        Keep the default limit/offset pagination and switch to the keyset pagination
+        when the client sends the cursor query param. The cursor pages are always ordered by creation,
+        so a cursor with an ordering or a search (ordered by rank) is refused instead of silently reordered
+    '''
+    cursor_pagination_class = CreatedCursorPagination
+    limit_offset_pagination_class = pagination.LimitOffsetPagination
+    cursor_unordered_params = ('ordering', 'search')
+
+    def __init__(self):
+        self.paginator = self.limit_offset_pagination_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_pagination_class.cursor_query_param in request.query_params:
+            params = [param for param in self.cursor_unordered_params if request.query_params.get(param)]
+            if params:
+                raise ValidationError({"errors": "The cursor pagination is ordered by creation, "
+                                                 "it can't be combined with {}".format(', '.join(params))})
+            self.paginator = self.cursor_pagination_class()
+        return self.paginator.paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_schema_fields(self, view):
+        return (self.limit_offset_pagination_class().get_schema_fields(view) +
+                self.cursor_pagination_class().get_schema_fields(view)[:1])
@@ -0,0 +1,41 @@
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class MenuCSVParser(BaseParser):
+    '''
+        Parse a menu CSV with a `category,name,short_description,size,price` header
+        and one row per item size into the payload of the menu import,
+        the rows of the same category and item name are grouped into one item
+    '''
+    media_type = 'text/csv'
+    columns = ('category', 'name', 'short_description', 'size', 'price')
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            reader = csv.DictReader(codecs.iterdecode(stream, encoding))
+            missing_columns = set(self.columns) - set(reader.fieldnames or ())
+            if missing_columns:
+                raise ParseError('CSV is missing the columns: {}'.format(', '.join(sorted(missing_columns))))
+
+            items = {}
+            for row in reader:
+                key = (row['category'], row['name'])
+                if key not in items:
+                    items[key] = {
+                        'row': reader.line_num,
+                        'category': row['category'],
+                        'name': row['name'],
+                        'short_description': row['short_description'],
+                        'sizes': [],
+                    }
+                items[key]['sizes'].append({'size': row['size'], 'price': row['price']})
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ParseError('CSV parse error - {}'.format(exc))
+        return {'items': list(items.values())}
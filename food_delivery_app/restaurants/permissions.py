@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import permissions
+
+from .models import Restaurant
+
+
+def user_restaurants_key(user_id):
+    return 'users:{}:restaurant-ids'.format(user_id)
+
+
+def get_user_restaurant_ids(user):
+    '''
+        Ids of the restaurants the user owns or works for, kept in the shared cache
+        until the memberships of the user change, see signals
+    '''
+    key = user_restaurants_key(user.pk)
+    restaurant_ids = cache.get(key)
+    if restaurant_ids is None:
+        restaurant_ids = set(Restaurant.objects.filter(Q(users=user) | Q(owner=user))
+                             .order_by().values_list('pk', flat=True).distinct())
+        cache.set(key, restaurant_ids, settings.RESTAURANT_MEMBERSHIP_CACHE_TIMEOUT)
+    return restaurant_ids
+
+
+def clear_user_restaurant_ids(user_ids):
+    keys = [user_restaurants_key(user_id) for user_id in user_ids if user_id]
+    if keys:
+        cache.delete_many(keys)
+        # and once more after commit, in case a concurrent request cached the old memberships meanwhile
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def is_restaurant_member(user, restaurant_id):
+    return bool(user and user.is_authenticated) and int(restaurant_id) in get_user_restaurant_ids(user)
+
+
+def get_restaurant_id(view, obj=None):
+    if obj is None:
+        return view.kwargs.get('restaurant_id')
+    return obj.pk if isinstance(obj, Restaurant) else obj.restaurant_id
+
+
+class IsRestaurantMember(permissions.BasePermission):
+    '''
+        Only the owner and the users of the restaurant, either the restaurant of the nested URL or of the object
+    '''
+
+    def has_permission(self, request, view):
+        restaurant_id = get_restaurant_id(view)
+        return restaurant_id is None or is_restaurant_member(request.user, restaurant_id)
+
+    def has_object_permission(self, request, view, obj):
+        return is_restaurant_member(request.user, get_restaurant_id(view, obj))
+
+
+class IsRestaurantMemberOrReadOnly(IsRestaurantMember):
+
+    def has_permission(self, request, view):
+        return request.method in permissions.SAFE_METHODS or super().has_permission(request, view)
+
+    def has_object_permission(self, request, view, obj):
+        return request.method in permissions.SAFE_METHODS or super().has_object_permission(request, view, obj)
+
+
+class IsRestaurantMemberOrCustomer(IsRestaurantMember):
+    '''
+        The members manage all the orders of the restaurant, the customers can place orders and follow their own
+    '''
+    customer_actions = ('create', 'retrieve', 'events')
+
+    def has_permission(self, request, view):
+        return view.action in self.customer_actions or super().has_permission(request, view)
+
+    def has_object_permission(self, request, view, obj):
+        return obj.customer_id == request.user.pk or super().has_object_permission(request, view, obj)
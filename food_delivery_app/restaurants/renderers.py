@@ -0,0 +1,19 @@
+import json
+
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    '''
+        Lets EventSource clients (Accept: text/event-stream) pass the content negotiation,
+        the events themselves are streamed by the view, only error responses are rendered here
+    '''
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return 'event: error\ndata: {}\n\n'.format(json.dumps(data, cls=JSONEncoder)).encode(self.charset)
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
 from food_delivery_app.users.serializers import UserSerializer
@@ -10,20 +11,77 @@ User = get_user_model()
 
 class RestaurantDefault:
     def set_context(self, serializer_field):
-        restaurant_id = serializer_field.context['view'].kwargs['restaurant_id']
-        self.restaurant = Restaurant.objects.get(pk=restaurant_id)
+        # resolved once per request by the view, see RestaurantNestedMixin
+        self.restaurant = serializer_field.context['view'].get_restaurant()
 
     def __call__(self):
         return self.restaurant
 
 
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    '''
+        Validates the pk without fetching the related object,
+        BulkRelatedListSerializer fetches the objects of all the children in one query
+    '''
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        validated_data = super().to_internal_value(data)
+        errors = [{} for _ in validated_data]
+        for field_name, field in self.child.fields.items():
+            if not isinstance(field, BulkPrimaryKeyRelatedField) or field.read_only:
+                continue
+            pks = {attrs[field.source] for attrs in validated_data if field.source in attrs}
+            objects = field.get_queryset().in_bulk(pks)
+            for index, attrs in enumerate(validated_data):
+                if field.source not in attrs:
+                    continue
+                pk = attrs[field.source]
+                if pk in objects:
+                    attrs[field.source] = objects[pk]
+                else:
+                    errors[index][field_name] = [field.error_messages['does_not_exist'].format(pk_value=pk)]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return validated_data
+
+
+class RenditionsField(serializers.ReadOnlyField):
+    '''
+        URLs of the resized copies of an image, {rendition: {format: url}}
+    '''
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+
+        def url(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return {
+            rendition: {image_format: url(name) for image_format, name in files.items()}
+            for rendition, files in value.items() if rendition != 'source'
+        }
+
+
 class RestaurantSerializer(serializers.ModelSerializer):
     owner = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), default=serializers.CurrentUserDefault())
     users = UserSerializer(many=True, required=False)
+    logo_renditions = RenditionsField()
 
     class Meta:
         model = Restaurant
-        fields = ('id', 'owner', 'users', 'name', 'phone', 'address', 'logo')
+        fields = ('id', 'owner', 'users', 'name', 'phone', 'address', 'logo', 'logo_renditions')
 
 
 class ItemSizeSerializer(serializers.ModelSerializer):
@@ -43,27 +101,57 @@ class CategorySerializer(serializers.ModelSerializer):
 
 
 class ItemSizeDetailsSerializer(serializers.ModelSerializer):
+    size = BulkPrimaryKeyRelatedField(queryset=ItemSize.objects.all())
 
     class Meta:
         model = ItemSizeDetails
         fields = ('id', 'size', 'price')
+        list_serializer_class = BulkRelatedListSerializer
 
 
 class ItemSerializer(serializers.ModelSerializer):
     restaurant = serializers.PrimaryKeyRelatedField(queryset=Restaurant.objects.all(), default=RestaurantDefault())
     item_sizes = ItemSizeDetailsSerializer(many=True, write_only=True)
     size_details = ItemSizeDetailsSerializer(many=True, read_only=True)
+    image_renditions = RenditionsField()
 
     class Meta:
         model = Item
-        fields = ('id', 'restaurant', 'category', 'name', 'short_description', 'image', 'size_details', 'item_sizes')
+        fields = ('id', 'restaurant', 'category', 'name', 'short_description', 'image', 'image_renditions',
+                  'size_details', 'item_sizes')
+
+
+class MenuItemSizeSerializer(serializers.ModelSerializer):
+    name = serializers.CharField(source='size.name')
+
+    class Meta:
+        model = ItemSizeDetails
+        fields = ('id', 'size', 'name', 'price')
+
+
+class MenuItemSerializer(serializers.ModelSerializer):
+    sizes = MenuItemSizeSerializer(source='size_details', many=True)
+
+    class Meta:
+        model = Item
+        fields = ('id', 'name', 'short_description', 'image', 'sizes')
+
+
+class MenuCategorySerializer(serializers.ModelSerializer):
+    items = MenuItemSerializer(many=True)
+
+    class Meta:
+        model = Category
+        fields = ('id', 'name', 'items')
 
 
 class ItemOrderDetailsSerializer(serializers.ModelSerializer):
+    item_size = BulkPrimaryKeyRelatedField(queryset=ItemSizeDetails.objects.all())
 
     class Meta:
         model = ItemOrderDetails
         fields = ('id', 'item_size', 'count')
+        list_serializer_class = BulkRelatedListSerializer
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -78,3 +166,81 @@ class OrderSerializer(serializers.ModelSerializer):
                   'comments', 'cooked_at', 'ready_at', 'on_the_way_at', 'delivered_at')
         read_only_fields = ('cooked_at', 'ready_at', 'on_the_way_at', 'delivered_at', 'status', 'orders_details',
                             'customer', 'total_price')
+
+
+class OrderReadSerializer(serializers.ModelSerializer):
+    '''
+        Read only serializer for listing/retrieving orders, it expects the customer to be selected
+        and the orders details to be prefetched with the orders
+    '''
+    customer = UserSerializer(read_only=True)
+    orders_details = ItemOrderDetailsSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ('id', 'restaurant', 'customer', 'orders_details', 'address', 'total_price', 'status',
+                  'comments', 'cooked_at', 'ready_at', 'on_the_way_at', 'delivered_at')
+        read_only_fields = fields
+
+
+class OrderStatusSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Order
+        fields = ('id', 'restaurant', 'status', 'cooked_at', 'ready_at', 'on_the_way_at', 'delivered_at')
+        read_only_fields = fields
+
+
+class MenuImportItemSizeSerializer(serializers.Serializer):
+    size = serializers.CharField(max_length=128)
+    price = serializers.IntegerField(min_value=0)
+
+
+class MenuImportItemSerializer(serializers.Serializer):
+    category = serializers.CharField(max_length=128)
+    name = serializers.CharField(max_length=128)
+    short_description = serializers.CharField(max_length=128)
+    sizes = MenuImportItemSizeSerializer(many=True, allow_empty=False)
+
+    def validate_sizes(self, sizes):
+        names = [size['size'] for size in sizes]
+        if len(names) != len(set(names)):
+            raise serializers.ValidationError("Item has duplicated sizes.")
+        return sizes
+
+
+class MenuImportSerializer(serializers.Serializer):
+    '''
+        Validate a whole menu in one pass without touching the database,
+        categories and sizes are referenced by name
+    '''
+    categories = serializers.ListField(child=serializers.CharField(max_length=128), required=False)
+    sizes = serializers.ListField(child=serializers.CharField(max_length=128), required=False)
+    items = MenuImportItemSerializer(many=True)
+
+    def validate_items(self, items):
+        seen, errors = set(), []
+        for item in items:
+            key = (item['category'], item['name'])
+            errors.append({'name': ["Item is duplicated in this category."]} if key in seen else {})
+            seen.add(key)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    def get_row_errors(self):
+        '''
+            Errors of the items are reported with their row, the CSV line for CSV imports
+            or the position in the items list for JSON imports
+        '''
+        errors = []
+        for field, field_errors in self.errors.items():
+            if field != 'items' or not isinstance(field_errors, list) or not isinstance(field_errors[0], dict):
+                errors.append({'field': field, 'errors': field_errors})
+                continue
+            for index, item_errors in enumerate(field_errors):
+                if item_errors:
+                    item = self.initial_data['items'][index]
+                    row = item.get('row', index + 1) if isinstance(item, dict) else index + 1
+                    errors.append({'row': row, 'errors': item_errors})
+        return errors
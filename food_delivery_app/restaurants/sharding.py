@@ -0,0 +1,262 @@
+import contextvars
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from food_delivery_app.core.cache import LocalTTLCache
+
+from .models import Restaurant, Category, ItemSize, Item, ItemSizeDetails, MenuSnapshot, Order, ItemOrderDetails
+
+# the models whose rows live on the shard of their restaurant with the lookup of their restaurant id,
+# in the order they're copied to another shard
+SHARDED_MODELS = (
+    (Category, 'restaurant_id'),
+    (ItemSize, 'restaurant_id'),
+    (Item, 'restaurant_id'),
+    (ItemSizeDetails, 'item__restaurant_id'),
+    (MenuSnapshot, 'restaurant_id'),
+    (Order, 'restaurant_id'),
+    (ItemOrderDetails, 'order__restaurant_id'),
+)
+sharded_models = {model for model, lookup in SHARDED_MODELS}
+
+# set for the requests of a restaurant, see RestaurantShardMixin
+_current_restaurant = contextvars.ContextVar('current_restaurant', default=None)
+
+local_shards_cache = LocalTTLCache(maxsize=settings.RESTAURANT_SHARD_LOCAL_CACHE_SIZE,
+                                   ttl=settings.RESTAURANT_SHARD_LOCAL_CACHE_TTL)
+
+SHARD_SEQUENCE_SQL = '''
+    SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {} WHERE id < %s)))
+'''
+
+
+def restaurant_shard_key(restaurant_id):
+    return 'restaurants:{}:shard'.format(restaurant_id)
+
+
+def restaurant_moving_key(restaurant_id):
+    return 'restaurants:{}:moving'.format(restaurant_id)
+
+
+def get_restaurant_shard(restaurant_id):
+    '''
+        Alias of the database holding the data of the restaurant, looked up in the in-process cache,
+        then in the shared cache and only then in the restaurants of the primary
+    '''
+    restaurant_id = int(restaurant_id)
+    shard = local_shards_cache.get(restaurant_id)
+    if shard is None:
+        key = restaurant_shard_key(restaurant_id)
+        shard = cache.get(key)
+        if shard is None:
+            shard = (Restaurant.objects.using(DEFAULT_DB_ALIAS).filter(pk=restaurant_id)
+                     .values_list('shard', flat=True).first())
+            if shard is None:
+                # not created yet, so don't cache it
+                return DEFAULT_DB_ALIAS
+            cache.set(key, shard, settings.RESTAURANT_SHARD_CACHE_TIMEOUT)
+        local_shards_cache.set(restaurant_id, shard)
+    return shard
+
+
+def clear_restaurant_shard(restaurant_id):
+    local_shards_cache.delete(int(restaurant_id))
+    cache.delete(restaurant_shard_key(restaurant_id))
+
+
+def is_restaurant_moving(restaurant_id):
+    return bool(cache.get(restaurant_moving_key(restaurant_id)))
+
+
+def wait_for_restaurant_move(restaurant_id):
+    '''
+        Hold the background writes to a restaurant while it's moved, it waits at most RESTAURANT_MOVE_WAIT_TIMEOUT
+    '''
+    deadline = time.monotonic() + settings.RESTAURANT_MOVE_WAIT_TIMEOUT
+    while is_restaurant_moving(restaurant_id):
+        if time.monotonic() >= deadline:
+            raise RuntimeError('Restaurant {} is still being moved'.format(restaurant_id))
+        time.sleep(settings.RESTAURANT_MOVE_WAIT_INTERVAL)
+
+
+def get_current_restaurant():
+    return _current_restaurant.get()
+
+
+def set_current_restaurant(restaurant_id):
+    return _current_restaurant.set(restaurant_id)
+
+
+@contextmanager
+def restaurant_context(restaurant_id):
+    '''
+        Route the queries of the sharded models to the shard of the restaurant, for the code outside its requests
+    '''
+    token = _current_restaurant.set(restaurant_id)
+    try:
+        yield
+    finally:
+        _current_restaurant.reset(token)
+
+
+def run_for_restaurant(restaurant_id, func, *args, **kwargs):
+    '''
+        Run a background task writing to the shard of the restaurant once it isn't being moved,
+        the shard is only looked up then
+    '''
+    wait_for_restaurant_move(restaurant_id)
+    with restaurant_context(restaurant_id):
+        return func(*args, **kwargs)
+
+
+class ShardRouter:
+    '''
+        Route the sharded models to the shard of the restaurant of the instance the query is made for,
+        else of the current restaurant, else to the primary. The reads of the primary and the other models
+        are left to the next routers
+    '''
+
+    def get_shard(self, instance=None):
+        if isinstance(instance, Restaurant) and instance.pk:
+            return get_restaurant_shard(instance.pk)
+        if type(instance) in sharded_models:
+            if instance._state.db in settings.RESTAURANT_SHARDS:
+                return instance._state.db
+            if getattr(instance, 'restaurant_id', None):
+                return get_restaurant_shard(instance.restaurant_id)
+        restaurant_id = _current_restaurant.get()
+        return get_restaurant_shard(restaurant_id) if restaurant_id is not None else DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        if model not in sharded_models:
+            return None
+        shard = self.get_shard(hints.get('instance'))
+        return shard if shard != DEFAULT_DB_ALIAS else None
+
+    def db_for_write(self, model, **hints):
+        if model not in sharded_models:
+            return None
+        return self.get_shard(hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if type(obj1) in sharded_models and type(obj2) in sharded_models:
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # every shard has the whole schema, the restaurants and the users are only filled on the primary
+        return True if db in settings.RESTAURANT_SHARDS else None
+
+
+def allocate_shard_ids(using):
+    '''
+        Start the id sequences of the sharded tables of the shard at its block of ids and cap them at its end,
+        so the inserts fail once a block is used up instead of taking the ids of the next shard.
+        It keeps the sequences that are past the start already so it's run after every migrate
+    '''
+    block = settings.RESTAURANT_SHARDS.get(using)
+    connection = connections[using]
+    if block is None or connection.vendor != 'postgresql':
+        return
+    start = block * settings.RESTAURANT_SHARD_ID_BLOCK
+    end = start + settings.RESTAURANT_SHARD_ID_BLOCK
+    with connection.cursor() as cursor:
+        # the tables of the migrations that were rolled back are skipped
+        tables = set(connection.introspection.table_names(cursor))
+        for model, lookup in SHARDED_MODELS:
+            table = model._meta.db_table
+            if table not in tables:
+                continue
+            if start:
+                cursor.execute(SHARD_SEQUENCE_SQL.format(connection.ops.quote_name(table)), [table, start, end])
+            cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+            cursor.execute('ALTER SEQUENCE {} MAXVALUE %s'.format(cursor.fetchone()[0]), [end])
+
+
+class ShardsResults:
+    '''
+        The results of a queryset of a sharded model run on every shard and merged in its order by `key`,
+        for the limit/offset pagination: a page fetches `offset + limit` rows from every shard
+        and the count sums the counts of the shards
+    '''
+
+    def __init__(self, queryset, key):
+        self.querysets = [queryset.using(shard) for shard in settings.RESTAURANT_SHARDS]
+        self.key = key
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('The results of the shards can only be sliced')
+        rows = heapq.merge(*(list(queryset[:index.stop]) for queryset in self.querysets), key=self.key)
+        return list(itertools.islice(rows, index.start, index.stop))
+
+
+def delete_customer_orders(customer_id):
+    '''
+        Delete the orders of the customer from the shards other than the primary, where the deletion cascades
+    '''
+    for shard in settings.RESTAURANT_SHARDS:
+        if shard != DEFAULT_DB_ALIAS:
+            Order._base_manager.using(shard).filter(customer_id=customer_id).delete()
+
+
+def delete_restaurant_data(restaurant_id, using):
+    with transaction.atomic(using=using):
+        for model, lookup in reversed(SHARDED_MODELS):
+            model._base_manager.using(using).filter(**{lookup: restaurant_id}).delete()
+
+
+def copy_restaurant_data(restaurant_id, source, target, batch_size=1000):
+    '''
+        Copy the rows of the restaurant from the source shard to the target one with their ids in one transaction,
+        the rows left on the target by an interrupted move are replaced. Returns the number of rows per model
+    '''
+    copied = {}
+    with transaction.atomic(using=target):
+        delete_restaurant_data(restaurant_id, target)
+        for model, lookup in SHARDED_MODELS:
+            rows = model._base_manager.using(source).filter(**{lookup: restaurant_id}).order_by('pk')
+            copied[model._meta.label] = 0
+            last_pk = 0
+            while True:
+                batch = list(rows.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                model._base_manager.using(target).bulk_create(batch)
+                copied[model._meta.label] += len(batch)
+                last_pk = batch[-1].pk
+    return copied
+
+
+def move_restaurant(restaurant, target, wait=0, delete_source=True):
+    '''
+        Copy the data of the restaurant to the target shard and point the restaurant to it,
+        the writes to the restaurant are refused and the background ones held meanwhile. It waits `wait` seconds
+        for the requests in flight before copying, and for the in-process caches of the old shard to expire
+        before deleting the source rows
+    '''
+    source = restaurant.shard
+    key = restaurant_moving_key(restaurant.pk)
+    cache.set(key, True, None)
+    try:
+        time.sleep(wait)
+        copied = copy_restaurant_data(restaurant.pk, source, target)
+        with transaction.atomic(using=DEFAULT_DB_ALIAS):
+            restaurant.shard = target
+            restaurant.save(update_fields=['shard', 'modified'])
+            clear_restaurant_shard(restaurant.pk)
+        time.sleep(wait)
+        if delete_source:
+            delete_restaurant_data(restaurant.pk, source)
+    finally:
+        cache.delete(key)
+    return copied
@@ -1,10 +1,162 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed, post_migrate
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from food_delivery_app.core.images import process_image_renditions, renditions_changed
+from food_delivery_app.core.tasks import run_in_background
 
-from .models import Restaurant
+from .models import Restaurant, Category, ItemSize, Item, ItemSizeDetails
+from . import menu
+from .mixins import restaurant_cache_key
+from .permissions import clear_user_restaurant_ids
+from .sharding import (get_restaurant_shard, get_current_restaurant, clear_restaurant_shard, delete_restaurant_data,
+                       delete_customer_orders, allocate_shard_ids, run_for_restaurant)
+
+User = get_user_model()
 
 
 @receiver(post_save, sender=Restaurant, dispatch_uid='add_users_to_restaurant')
 def add_users_to_restaurant(sender, instance, created, **kwargs):
     if instance.users.count() == 0 and instance.owner not in instance.users.all():
         instance.users.add(instance.owner)
+
+
+@receiver(post_save, sender=Restaurant, dispatch_uid='restaurant_saved_clear_cache')
+@receiver(post_delete, sender=Restaurant, dispatch_uid='restaurant_deleted_clear_cache')
+def restaurant_changed(sender, instance, **kwargs):
+    key = restaurant_cache_key(instance.pk)
+    cache.delete(key)
+    # and once more after commit, in case a concurrent request cached the old row meanwhile
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+@receiver(m2m_changed, sender=Restaurant.users.through, dispatch_uid='restaurant_users_changed')
+def restaurant_users_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    '''
+        Touch the modified field of the restaurants whose users changed,
+        it's what their ETag/Last-Modified are computed from
+    '''
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        restaurants = Restaurant.objects.filter(pk=instance.pk)
+    elif action == 'pre_clear':
+        restaurants = instance.restaurants.all()
+    else:
+        restaurants = Restaurant.objects.filter(pk__in=pk_set)
+    restaurants.update(modified=timezone.now())
+
+
+@receiver(m2m_changed, sender=Restaurant.users.through, dispatch_uid='restaurant_memberships_changed')
+def restaurant_memberships_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    '''
+        Drop the cached restaurant ids of the users who joined or left restaurants
+    '''
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == 'pre_clear':
+        user_ids = list(instance.users.values_list('pk', flat=True))
+    else:
+        user_ids = pk_set
+    clear_user_restaurant_ids(user_ids)
+
+
+@receiver(pre_save, sender=Restaurant, dispatch_uid='restaurant_owner_changing')
+def restaurant_owner_changing(sender, instance, **kwargs):
+    instance._previous_owner_id = (Restaurant.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+                                   if instance.pk else None)
+
+
+@receiver(post_save, sender=Restaurant, dispatch_uid='restaurant_owner_changed')
+def restaurant_owner_changed(sender, instance, created, **kwargs):
+    '''
+        The owner is a member of the restaurant too, so drop the cached restaurant ids of the old and new owners
+    '''
+    previous_owner_id = getattr(instance, '_previous_owner_id', None)
+    if created or previous_owner_id != instance.owner_id:
+        clear_user_restaurant_ids([previous_owner_id, instance.owner_id])
+
+
+@receiver(post_save, sender=Restaurant, dispatch_uid='restaurant_saved_menu_changed')
+@receiver(post_save, sender=Category, dispatch_uid='category_saved_menu_changed')
+@receiver(post_delete, sender=Category, dispatch_uid='category_deleted_menu_changed')
+@receiver(post_save, sender=ItemSize, dispatch_uid='item_size_saved_menu_changed')
+@receiver(post_delete, sender=ItemSize, dispatch_uid='item_size_deleted_menu_changed')
+@receiver(post_save, sender=Item, dispatch_uid='item_saved_menu_changed')
+@receiver(post_delete, sender=Item, dispatch_uid='item_deleted_menu_changed')
+@receiver(post_save, sender=ItemSizeDetails, dispatch_uid='item_size_details_saved_menu_changed')
+@receiver(post_delete, sender=ItemSizeDetails, dispatch_uid='item_size_details_deleted_menu_changed')
+@receiver(renditions_changed, sender=Item, dispatch_uid='item_renditions_changed_menu_changed')
+def menu_changed(sender, instance, **kwargs):
+    if sender is Restaurant:
+        restaurant_id = instance.pk
+    elif sender is ItemSizeDetails:
+        # the item isn't fetched for every row when the restaurant of the request is known
+        restaurant_id = get_current_restaurant()
+        if restaurant_id is None or ItemSizeDetails.item.is_cached(instance):
+            restaurant_id = instance.item.restaurant_id
+    else:
+        restaurant_id = instance.restaurant_id
+    menu.menu_changed(restaurant_id, using=kwargs['using'])
+
+
+@receiver(post_save, sender=Restaurant, dispatch_uid='restaurant_saved_process_logo')
+@receiver(post_save, sender=Item, dispatch_uid='item_saved_process_image')
+def image_saved(sender, instance, **kwargs):
+    '''
+        Make the renditions of a new or replaced image in the background once it's committed
+    '''
+    if sender is Restaurant:
+        field_name, renditions_field_name = 'logo', 'logo_renditions'
+    else:
+        field_name, renditions_field_name = 'image', 'image_renditions'
+    source_name = getattr(instance, field_name).name or ''
+    renditions = getattr(instance, renditions_field_name)
+    if source_name == renditions.get('source', ''):
+        return
+    args = (sender._meta.label, instance.pk, field_name, renditions_field_name, source_name)
+    if sender is Restaurant:
+        task = partial(process_image_renditions, *args, kwargs['using'])
+    else:
+        # the item is looked up on the shard of its restaurant once it isn't being moved
+        task = partial(run_for_restaurant, instance.restaurant_id, process_image_renditions, *args)
+    transaction.on_commit(lambda: run_in_background(task), using=kwargs['using'])
+
+
+@receiver(pre_delete, sender=Restaurant, dispatch_uid='restaurant_deleting_delete_shard_data')
+def restaurant_deleting(sender, instance, **kwargs):
+    '''
+        The deletion only cascades on the primary, so delete the data of the restaurants of the other shards
+        once the deletion is committed, the restaurant keeps its data if it's rolled back
+    '''
+    restaurant_id, shard = instance.pk, get_restaurant_shard(instance.pk)
+    if shard != DEFAULT_DB_ALIAS:
+        transaction.on_commit(lambda: delete_restaurant_data(restaurant_id, shard), using=kwargs['using'])
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='customer_deleting_delete_shard_orders')
+def customer_deleting(sender, instance, **kwargs):
+    '''
+        The deletion only cascades on the primary, so delete the orders of the customer on the other shards
+        once the deletion is committed
+    '''
+    customer_id = instance.pk
+    transaction.on_commit(lambda: delete_customer_orders(customer_id), using=kwargs['using'])
+
+
+@receiver(post_delete, sender=Restaurant, dispatch_uid='restaurant_deleted_clear_shard')
+def restaurant_deleted(sender, instance, **kwargs):
+    clear_restaurant_shard(instance.pk)
+
+
+@receiver(post_migrate, dispatch_uid='shard_migrated_allocate_ids')
+def shard_migrated(sender, using, **kwargs):
+    if sender.name == 'food_delivery_app.restaurants':
+        allocate_shard_ids(using)
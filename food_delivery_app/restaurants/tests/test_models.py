@@ -1,3 +1,10 @@
+import hashlib
+import os
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 
 from ..models import Restaurant, Category, ItemSize, Item, ItemSizeDetails, Order, ItemOrderDetails
@@ -41,3 +48,52 @@ class TestRestaurantModel(TestCase):
         item_order_details = ItemOrderDetailsFactory.create()
         self.assertIsInstance(item_order_details, ItemOrderDetails)
         self.assertEqual(ItemOrderDetails.objects.count(), 1)
+
+
+class TestOrderModel(TestCase):
+
+    def test_transition_status(self):
+        order = OrderFactory(status=Order.PICKED)
+        self.assertTrue(order.transition_status(Order.COOKING))
+        self.assertEqual(order.status, Order.COOKING)
+        self.assertNotEqual(order.cooked_at, None)
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.COOKING)
+        self.assertNotEqual(order.cooked_at, None)
+
+    def test_transition_status_of_stale_order(self):
+        order = OrderFactory(status=Order.PICKED)
+        stale_order = Order.objects.get(pk=order.pk)
+        self.assertTrue(order.transition_status(Order.COOKING))
+
+        self.assertFalse(stale_order.transition_status(Order.COOKING))
+        self.assertEqual(stale_order.status, Order.PICKED)
+        self.assertFalse(stale_order.transition_status(Order.CANCELLED))
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.COOKING)
+
+
+class TestItemImage(TestCase):
+
+    def test_content_addressed_image(self):
+        content = b'the same dish photo'
+        digest = hashlib.sha256(content).hexdigest()
+        with tempfile.TemporaryDirectory() as media_root, \
+                self.settings(MEDIA_CONTENT_ADDRESSED=True, MEDIA_ROOT=media_root):
+            item = ItemFactory(image=SimpleUploadedFile('Pizza.JPG', content))
+            self.assertEqual(item.image.name, 'items/sha256/{}/{}.jpg'.format(digest[:2], digest))
+
+            with mock.patch.object(FileSystemStorage, '_save', side_effect=AssertionError('uploaded twice')):
+                other_item = ItemFactory(image=SimpleUploadedFile('pizza.jpg', content))
+            self.assertEqual(other_item.image.name, item.image.name)
+            self.assertEqual(os.listdir(os.path.join(media_root, 'items/sha256', digest[:2])), [digest + '.jpg'])
+            cache_control = item.image.storage.get_cache_control(item.image.name)
+            self.assertEqual(cache_control, 'public, max-age=31536000, immutable')
+
+    def test_random_image_name(self):
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            item = ItemFactory(image=SimpleUploadedFile('pizza.jpg', b'photo'))
+            other_item = ItemFactory(image=SimpleUploadedFile('pizza.jpg', b'photo'))
+        self.assertTrue(item.image.name.startswith('items/container_{}/pizza-'.format(item.restaurant_id)))
+        self.assertNotEqual(other_item.image.name, item.image.name)
+        self.assertIsNone(item.image.storage.get_cache_control(item.image.name))
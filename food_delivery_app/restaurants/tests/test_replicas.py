@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections, DatabaseError
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.authtoken.models import Token
+
+from food_delivery_app.core.db_routers import replica_lags_cache
+from food_delivery_app.users.tests.factories import UserFactory
+
+from ..models import MenuSnapshot
+from .factories import RestaurantFactory
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class TestReplicaReads(TransactionTestCase):
+    '''
+        The replica alias is a second connection to the test database, so the data has to be committed
+    '''
+    multi_db = True
+
+    def setUp(self):
+        cache.clear()
+        replica_lags_cache.clear()
+        self.user = UserFactory()
+        self.restaurant = RestaurantFactory(owner=self.user)
+        self.client = APIClient()
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        self.url = reverse("api_v1:categories-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+    def get_replica_queries(self):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertGreater(self.get_replica_queries(), 0)
+
+    def test_writes_pin_the_user_to_primary(self):
+        response = self.client.post(self.url, {"name": "Main Course"}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.get_replica_queries(), 0)
+
+        cache.clear()
+        self.assertGreater(self.get_replica_queries(), 0)
+
+    def test_failed_writes_dont_pin_the_user(self):
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertGreater(self.get_replica_queries(), 0)
+
+    @mock.patch('food_delivery_app.core.db_routers.get_replica_lag', return_value=60)
+    def test_lagging_replica_falls_back_to_primary(self, get_replica_lag):
+        self.assertEqual(self.get_replica_queries(), 0)
+        self.assertEqual(self.get_replica_queries(), 0)
+        # the lag is checked once per interval
+        get_replica_lag.assert_called_once_with('replica')
+
+    @mock.patch('food_delivery_app.core.db_routers.get_replica_lag', side_effect=DatabaseError)
+    def test_unreachable_replica_falls_back_to_primary(self, get_replica_lag):
+        self.assertEqual(self.get_replica_queries(), 0)
+
+    def test_missing_menu_is_built_from_primary(self):
+        MenuSnapshot.objects.all().delete()
+        url = reverse("api_v1:restaurants-menu", kwargs={"pk": self.restaurant.pk})
+        with CaptureQueriesContext(connections['replica']) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'restaurants_category' in query['sql']])
@@ -0,0 +1,155 @@
+import io
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+from rest_framework.authtoken.models import Token
+
+from food_delivery_app.users.tests.factories import UserFactory
+
+from ..models import Restaurant, Category, Item, ItemSizeDetails, Order, ItemOrderDetails
+from ..menu import rebuild_menu_snapshots
+from ..sharding import local_shards_cache, restaurant_moving_key
+from .factories import (RestaurantFactory, CategoryFactory, ItemSizeFactory, ItemFactory, ItemSizeDetailsFactory,
+                        OrderFactory, ItemOrderDetailsFactory)
+
+
+class TestRestaurantShards(APITestCase):
+    multi_db = True
+
+    def setUp(self):
+        cache.clear()
+        local_shards_cache.clear()
+        self.user = UserFactory()
+        self.client = APIClient()
+        token, _ = Token.objects.get_or_create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        self.restaurant = RestaurantFactory(owner=self.user)
+        self.category = CategoryFactory(restaurant=self.restaurant)
+        self.item = ItemFactory(restaurant=self.restaurant, category=self.category)
+        self.size_details = ItemSizeDetailsFactory(item=self.item, size=ItemSizeFactory(restaurant=self.restaurant))
+        self.order = OrderFactory(restaurant=self.restaurant, customer=self.user)
+        ItemOrderDetailsFactory(order=self.order, item_size=self.size_details)
+
+    def move(self, shard):
+        call_command('move_restaurant', self.restaurant.pk, shard, wait=0, stdout=io.StringIO())
+
+    def test_move_restaurant(self):
+        self.move('shard-1')
+
+        self.assertEqual(Restaurant.objects.get(pk=self.restaurant.pk).shard, 'shard-1')
+        for model in (Category, Item, ItemSizeDetails, Order, ItemOrderDetails):
+            self.assertEqual(model.objects.using('default').count(), 0)
+            self.assertEqual(model.objects.using('shard-1').count(), 1)
+        # the rows keep their ids
+        self.assertEqual(Order.objects.using('shard-1').get().pk, self.order.pk)
+
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['id'] for order in response.data['results']], [self.order.pk])
+        self.assertEqual(response.data['results'][0]['customer']['id'], self.user.pk)
+
+        self.move('default')
+        self.assertEqual(Order.objects.using('default').get().pk, self.order.pk)
+        self.assertEqual(Order.objects.using('shard-1').count(), 0)
+
+    def test_writes_go_to_the_shard_of_the_restaurant(self):
+        self.move('shard-1')
+        url = reverse("api_v1:categories-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+        response = self.client.post(url, {"name": "Desserts"}, format='json')
+        self.assertEqual(response.status_code, 201)
+        category = Category.objects.using('shard-1').get(name='Desserts')
+        # allocated from the block of ids of the shard
+        self.assertGreater(category.pk, settings.RESTAURANT_SHARD_ID_BLOCK)
+
+        response = self.client.get(url)
+        self.assertEqual(sorted(category['id'] for category in response.data['results']),
+                         [self.category.pk, category.pk])
+
+    def test_moving_restaurant_refuses_writes(self):
+        cache.set(restaurant_moving_key(self.restaurant.pk), True)
+        url = reverse("api_v1:categories-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+        response = self.client.post(url, {"name": "Desserts"}, format='json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_delete_restaurant_deletes_its_shard_data(self):
+        self.move('shard-1')
+        url = reverse("api_v1:restaurants-detail", kwargs={"pk": self.restaurant.pk})
+
+        with mock.patch('food_delivery_app.restaurants.signals.transaction.on_commit') as on_commit:
+            response = self.client.delete(url)
+        self.assertEqual(response.status_code, 204)
+        # the rows of the shard are only deleted once the deletion of the restaurant is committed
+        self.assertEqual(Order.objects.using('shard-1').count(), 1)
+        for args, kwargs in on_commit.call_args_list:
+            args[0]()
+        self.assertEqual(Order.objects.using('shard-1').count(), 0)
+        self.assertEqual(Category.objects.using('shard-1').count(), 0)
+
+    def test_search_items_of_every_shard(self):
+        ItemFactory(restaurant=self.restaurant, category=self.category, name='Chicken Burger')
+        self.move('shard-1')
+        other_restaurant = RestaurantFactory()
+        other_item = ItemFactory(restaurant=other_restaurant, category=CategoryFactory(restaurant=other_restaurant),
+                                 name='Chicken Pizza')
+        url = reverse("api_v1:restaurants-items-search")
+
+        response = self.client.get(url, {"search": "chicken"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        ids = [item['id'] for item in response.data['results']]
+        self.assertEqual(set(ids), {Item.objects.using('shard-1').get(name='Chicken Burger').pk, other_item.pk})
+
+        response = self.client.get(url, {"search": "chicken", "limit": 1, "offset": 1})
+        self.assertEqual([item['id'] for item in response.data['results']], ids[1:])
+
+    def test_delete_customer_deletes_its_orders_of_every_shard(self):
+        customer = UserFactory()
+        OrderFactory(restaurant=self.restaurant, customer=customer)
+        self.move('shard-1')
+        orders = Order.objects.using('shard-1').filter(customer_id=customer.pk)
+
+        with mock.patch('food_delivery_app.restaurants.signals.transaction.on_commit') as on_commit:
+            customer.delete()
+        self.assertEqual(orders.count(), 1)
+        for args, kwargs in on_commit.call_args_list:
+            args[0]()
+        self.assertEqual(orders.count(), 0)
+        self.assertEqual(Order.objects.using('shard-1').count(), 1)
+
+    def test_id_sequences_are_capped_at_their_block(self):
+        for shard, block in settings.RESTAURANT_SHARDS.items():
+            with connections[shard].cursor() as cursor:
+                cursor.execute("SELECT max_value FROM pg_sequences WHERE sequencename = 'restaurants_order_id_seq'")
+                self.assertEqual(cursor.fetchone()[0], (block + 1) * settings.RESTAURANT_SHARD_ID_BLOCK)
+
+    @mock.patch('food_delivery_app.restaurants.sharding.time.sleep')
+    @mock.patch('food_delivery_app.restaurants.sharding.is_restaurant_moving', side_effect=[True, False])
+    def test_background_writes_wait_for_the_move(self, is_restaurant_moving, sleep):
+        rebuild_menu_snapshots(self.restaurant.pk)
+        self.assertEqual(is_restaurant_moving.call_count, 2)
+        sleep.assert_called_once_with(settings.RESTAURANT_MOVE_WAIT_INTERVAL)
+
+    @mock.patch('food_delivery_app.restaurants.sharding.time.monotonic', side_effect=[0, 0, 10 ** 6])
+    @mock.patch('food_delivery_app.restaurants.sharding.time.sleep')
+    def test_background_writes_give_up_on_a_stuck_move(self, sleep, monotonic):
+        cache.set(restaurant_moving_key(self.restaurant.pk), True)
+        with self.assertRaises(RuntimeError):
+            rebuild_menu_snapshots(self.restaurant.pk)
+
+    def test_missing_menu_of_moving_restaurant(self):
+        cache.set(restaurant_moving_key(self.restaurant.pk), True)
+        url = reverse("api_v1:restaurants-menu", kwargs={"pk": self.restaurant.pk})
+
+        with mock.patch('food_delivery_app.restaurants.views.get_menu_snapshot', return_value=None):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
@@ -1,16 +1,51 @@
+import gzip
+import io
 import json
-
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction, IntegrityError
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 
+from food_delivery_app.users.authentication import CachedTokenAuthentication
 from food_delivery_app.users.tests.factories import UserFactory
 
-from ..models import Restaurant, Category, ItemSize, Item, Order
+from ..autocomplete import suggestions_cache
+from ..menu import menu_rebuild_key, rebuild_menu_snapshots
+from ..mixins import restaurant_cache_key
+from ..permissions import get_user_restaurant_ids
+from ..models import Restaurant, Category, ItemSize, Item, ItemSizeDetails, Order, MenuSnapshot
+from ..views import OrderViewSet
 from .factories import (RestaurantFactory, CategoryFactory, ItemSizeFactory, ItemFactory, ItemSizeDetailsFactory,
                         OrderFactory, ItemOrderDetailsFactory, create_item_with_sizes)
 
 
+def warm_up_caches(user):
+    '''
+        Authenticate the token of the user and resolve its memberships like the first request of the user does
+    '''
+    CachedTokenAuthentication().authenticate_credentials(user.auth_token.key)
+    get_user_restaurant_ids(user)
+
+
+def run_commit_callbacks():
+    '''
+        Run the callbacks registered on commit so far like a commit does, the test transaction is never committed
+    '''
+    callbacks, connection.run_on_commit = connection.run_on_commit, []
+    for savepoint_ids, callback in callbacks:
+        callback()
+
+
 class TestRestaurantAPIViews(APITestCase):
 
     def setUp(self):
@@ -27,6 +62,356 @@ class TestRestaurantAPIViews(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(Restaurant.objects.count(), response.data.get('count'))
 
+    def test_autocomplete(self):
+        suggestions_cache.clear()
+        pizza_hut = RestaurantFactory(name='Pizza Hut')
+        RestaurantFactory(name='Burger King')
+        # a category of the same restaurant, else the factory makes up restaurants with names that may match
+        category = CategoryFactory(restaurant=pizza_hut)
+        margherita = ItemFactory(restaurant=pizza_hut, category=category, name='Margherita Pizza')
+        ItemFactory(restaurant=pizza_hut, category=category, name='Chicken Wings')
+        url = reverse("api_v1:restaurants-autocomplete")
+
+        response = self.client.get(url, {"q": "piza"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([restaurant.get('id') for restaurant in response.data.get('restaurants')], [pizza_hut.pk])
+        self.assertEqual([item.get('id') for item in response.data.get('items')], [margherita.pk])
+
+        response = self.client.get(url, {"q": "Margarita"})
+        self.assertEqual(response.data.get('items'), [
+            {'id': margherita.pk, 'name': 'Margherita Pizza', 'restaurant': pizza_hut.pk}
+        ])
+
+        response = self.client.get(url, {"q": "bur"})
+        self.assertEqual([restaurant.get('name') for restaurant in response.data.get('restaurants')], ['Burger King'])
+
+    def test_autocomplete_resets_the_latency_budget(self):
+        suggestions_cache.clear()
+        RestaurantFactory(name='Pizza Hut')
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            statement_timeout = cursor.fetchone()[0]
+
+        response = self.client.get(reverse("api_v1:restaurants-autocomplete"), {"q": "pizza"})
+        self.assertEqual(len(response.data.get('restaurants')), 1)
+        # the test transaction is still open like the one of a request
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW statement_timeout')
+            self.assertEqual(cursor.fetchone()[0], statement_timeout)
+
+    def test_autocomplete_short_or_cached_query(self):
+        suggestions_cache.clear()
+        RestaurantFactory(name='Pizza Hut')
+        url = reverse("api_v1:restaurants-autocomplete")
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"q": "p"})
+        self.assertEqual(response.data, {'restaurants': [], 'items': []})
+        self.assertFalse([query for query in queries if 'restaurants_item' in query['sql']])
+
+        self.client.get(url, {"q": "pizza"})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {"q": " PIZZA "})
+        self.assertEqual(len(response.data.get('restaurants')), 1)
+        self.assertFalse([query for query in queries if 'restaurants_item' in query['sql']])
+
+    def test_restaurant_menu(self):
+        restaurant = RestaurantFactory()
+        category = CategoryFactory(restaurant=restaurant, name='Pizza')
+        CategoryFactory(restaurant=restaurant, name='Drinks')
+        size = ItemSizeFactory(restaurant=restaurant, name='Large')
+        item = ItemFactory(restaurant=restaurant, category=category)
+        ItemSizeDetailsFactory(item=item, size=size, price=120)
+        url = reverse("api_v1:restaurants-menu", kwargs={"pk": restaurant.pk})
+
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        menu = json.loads(response.content)
+        self.assertEqual(menu.get('id'), restaurant.pk)
+        self.assertEqual([category.get('name') for category in menu.get('categories')], ['Drinks', 'Pizza'])
+        pizza = menu.get('categories')[1]
+        self.assertEqual(pizza.get('items')[0].get('id'), item.pk)
+        self.assertEqual(pizza.get('items')[0].get('sizes'), [
+            {'id': item.size_details.get().pk, 'size': size.pk, 'name': 'Large', 'price': 120}
+        ])
+
+    def test_restaurant_menu_queries_dont_depend_on_menu_size(self):
+        small_restaurant = RestaurantFactory()
+        item = ItemFactory(restaurant=small_restaurant, category=CategoryFactory(restaurant=small_restaurant))
+        ItemSizeDetailsFactory(item=item, size=ItemSizeFactory(restaurant=small_restaurant))
+        big_restaurant = RestaurantFactory()
+        sizes = ItemSizeFactory.create_batch(3, restaurant=big_restaurant)
+        for category in CategoryFactory.create_batch(3, restaurant=big_restaurant):
+            for item in ItemFactory.create_batch(4, restaurant=big_restaurant, category=category):
+                for size in sizes:
+                    ItemSizeDetailsFactory(item=item, size=size)
+
+        # the token and the memberships of the user are cached by the first request
+        warm_up_caches(self.user)
+        with CaptureQueriesContext(connection) as small_menu_queries:
+            response = self.client.get(reverse("api_v1:restaurants-menu", kwargs={"pk": small_restaurant.pk}))
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as big_menu_queries:
+            response = self.client.get(reverse("api_v1:restaurants-menu", kwargs={"pk": big_restaurant.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(json.loads(response.content)['categories'][0]['items'][0]['sizes']), 3)
+        self.assertEqual(len(small_menu_queries), len(big_menu_queries))
+
+    def test_restaurant_menu_snapshot(self):
+        restaurant = RestaurantFactory()
+        item = ItemFactory(restaurant=restaurant, category=CategoryFactory(restaurant=restaurant))
+        url = reverse("api_v1:restaurants-menu", kwargs={"pk": restaurant.pk})
+        self.assertFalse(MenuSnapshot.objects.exists())
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        snapshot = MenuSnapshot.objects.get(restaurant=restaurant)
+        self.assertEqual(bytes(snapshot.content), response.content)
+        # savepoint, snapshot, release savepoint
+        with self.assertNumQueries(3):
+            snapshot_response = self.client.get(url)
+        self.assertEqual(snapshot_response.content, response.content)
+
+        version = snapshot.version
+        item.name = 'Meat Pizza'
+        item.save()
+        run_commit_callbacks()
+        snapshot.refresh_from_db()
+        self.assertGreater(snapshot.version, version)
+        self.assertIn(b'Meat Pizza', bytes(snapshot.content))
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content)['categories'][0]['items'][0]['name'], 'Meat Pizza')
+
+    def test_restaurant_menu_changes_are_coalesced(self):
+        restaurant = RestaurantFactory()
+        category = CategoryFactory(restaurant=restaurant)
+        run_commit_callbacks()
+        with mock.patch('food_delivery_app.restaurants.menu.transaction.on_commit') as on_commit:
+            ItemFactory.create_batch(3, restaurant=restaurant, category=category)
+
+        self.assertEqual([args[0].args for args, kwargs in on_commit.call_args_list], [(restaurant.pk,)])
+
+    def test_restaurant_menu_change_of_rolled_back_savepoint(self):
+        restaurant = RestaurantFactory()
+        category = CategoryFactory(restaurant=restaurant)
+        run_commit_callbacks()
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                ItemFactory(restaurant=restaurant, category=category)
+                raise IntegrityError
+
+        # the change scheduled in the savepoint was rolled back with it, so the next one is scheduled again
+        ItemFactory(restaurant=restaurant, category=category)
+        with mock.patch('food_delivery_app.restaurants.menu.run_in_background') as run_in_background:
+            run_commit_callbacks()
+        run_in_background.assert_called_once_with(rebuild_menu_snapshots, restaurant.pk)
+
+    def test_stale_restaurant_menu_is_rebuilt(self):
+        restaurant = RestaurantFactory()
+        item = ItemFactory(restaurant=restaurant, category=CategoryFactory(restaurant=restaurant))
+        url = reverse("api_v1:restaurants-menu", kwargs={"pk": restaurant.pk})
+        self.client.get(url)
+        run_commit_callbacks()
+
+        # the change is committed but its rebuild is lost with its worker
+        item.name = 'Meat Pizza'
+        item.save()
+        with mock.patch('food_delivery_app.restaurants.menu.run_in_background'):
+            run_commit_callbacks()
+        cache.delete(menu_rebuild_key(restaurant.pk))
+
+        response = self.client.get(url)
+        self.assertNotIn(b'Meat Pizza', response.content)
+        response = self.client.get(url)
+        self.assertIn(b'Meat Pizza', response.content)
+
+    def test_restaurant_menu_manifest(self):
+        restaurant = RestaurantFactory()
+        item = ItemFactory(restaurant=restaurant, category=CategoryFactory(restaurant=restaurant))
+        url = reverse("api_v1:restaurants-menu-manifest", kwargs={"pk": restaurant.pk})
+
+        with tempfile.TemporaryDirectory() as media_root, \
+                self.settings(MENU_EXPORT_ENABLED=True, MEDIA_ROOT=media_root, MEDIA_URL='/media/'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('max-age=60', response['Cache-Control'])
+            snapshot = MenuSnapshot.objects.get(restaurant=restaurant)
+            self.assertEqual(response.data.get('version'), snapshot.version)
+            self.assertEqual(response.data.get('url'), 'http://testserver/media/' + snapshot.export_path)
+            with open(os.path.join(media_root, snapshot.export_path), 'rb') as export:
+                self.assertEqual(gzip.decompress(export.read()), bytes(snapshot.content))
+
+            item.name = 'Meat Pizza'
+            item.save()
+            run_commit_callbacks()
+            response = self.client.get(url)
+            self.assertGreater(response.data.get('version'), snapshot.version)
+            with open(os.path.join(media_root, MenuSnapshot.objects.get().export_path), 'rb') as export:
+                menu = json.loads(gzip.decompress(export.read()))
+            self.assertEqual(menu['categories'][0]['items'][0]['name'], 'Meat Pizza')
+            self.assertTrue(os.path.exists(os.path.join(media_root, snapshot.export_path)))
+
+    def test_restaurant_menu_manifest_not_published(self):
+        url = reverse("api_v1:restaurants-menu-manifest", kwargs={"pk": RestaurantFactory().pk})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_restaurant_menu_not_found(self):
+        response = self.client.get(reverse("api_v1:restaurants-menu", kwargs={"pk": 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_restaurants_not_modified(self):
+        restaurants = RestaurantFactory.create_batch(3)
+        url = reverse("api_v1:restaurants-list")
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        restaurants[0].delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.get('count'), 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_retrieve_restaurant_not_modified(self):
+        restaurant = RestaurantFactory()
+        Restaurant.objects.filter(pk=restaurant.pk).update(modified=timezone.now() - timedelta(days=1))
+        url = reverse("api_v1:restaurants-detail", kwargs={"pk": restaurant.pk})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        last_modified = response['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        restaurant.users.add(UserFactory())
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data.get('users')), 2)
+
+    def test_retrieve_with_invalid_pk(self):
+        restaurant = RestaurantFactory(owner=self.user)
+        response = self.client.get(reverse("api_v1:restaurants-detail", kwargs={"pk": "abc"}))
+        self.assertEqual(response.status_code, 404)
+        url = reverse("api_v1:items-detail", kwargs={"restaurant_id": restaurant.pk, "pk": "abc"})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_import_menu(self):
+        restaurant = RestaurantFactory(owner=self.user)
+        CategoryFactory(restaurant=restaurant, name='Pizza')
+        url = reverse("api_v1:restaurants-menu-import", kwargs={"pk": restaurant.pk})
+        data = {
+            "sizes": ["Small"],
+            "items": [
+                {"category": "Pizza", "name": "Chicken Pizza", "short_description": "Delecious Pizza!",
+                 "sizes": [{"size": "Medium", "price": 50}, {"size": "Large", "price": 80}]},
+                {"category": "Drinks", "name": "Cola", "short_description": "Cold",
+                 "sizes": [{"size": "Small", "price": 10}]},
+            ]
+        }
+
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'categories': 1, 'item_sizes': 3, 'items': 2, 'item_size_details': 3,
+                                         'updated_items': 0, 'updated_item_size_details': 0})
+        self.assertEqual(Category.objects.filter(restaurant=restaurant).count(), 2)
+        pizza = Item.objects.get(restaurant=restaurant, name='Chicken Pizza')
+        self.assertEqual(pizza.category.name, 'Pizza')
+        self.assertEqual(pizza.size_details.get(size__name='Large').price, 80)
+
+    def test_import_menu_again_updates_the_items(self):
+        restaurant = RestaurantFactory(owner=self.user)
+        url = reverse("api_v1:restaurants-menu-import", kwargs={"pk": restaurant.pk})
+        data = {"items": [
+            {"category": "Pizza", "name": "Chicken Pizza", "short_description": "Delecious Pizza!",
+             "sizes": [{"size": "Medium", "price": 50}]},
+            {"category": "Drinks", "name": "Cola", "short_description": "Cold",
+             "sizes": [{"size": "Small", "price": 10}]},
+        ]}
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        Item.objects.filter(restaurant=restaurant).update(modified=timezone.now() - timedelta(days=1))
+        cola = Item.objects.get(restaurant=restaurant, name='Cola')
+        cola_url = reverse("api_v1:items-detail", kwargs={"restaurant_id": restaurant.pk, "pk": cola.pk})
+        etag = self.client.get(cola_url)['ETag']
+
+        # the existing items changed by a re-import get new validators
+        data['items'][1]['sizes'] = [{"size": "Small", "price": 10}, {"size": "Medium", "price": 15}]
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get(cola_url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        data['items'][0]['short_description'] = "Spicy Pizza!"
+        data['items'][0]['sizes'] = [{"size": "Medium", "price": 55}, {"size": "Large", "price": 80}]
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'categories': 0, 'item_sizes': 1, 'items': 0, 'item_size_details': 1,
+                                         'updated_items': 1, 'updated_item_size_details': 1})
+        pizza = Item.objects.get(restaurant=restaurant, name='Chicken Pizza')
+        self.assertGreater(pizza.modified, timezone.now() - timedelta(hours=1))
+        self.assertEqual(Item.objects.filter(restaurant=restaurant).count(), 2)
+        pizza = Item.objects.get(restaurant=restaurant, name='Chicken Pizza')
+        self.assertEqual(pizza.short_description, "Spicy Pizza!")
+        self.assertEqual({size.size.name: size.price for size in pizza.size_details.all()},
+                         {'Medium': 55, 'Large': 80})
+
+    def test_import_menu_queries_dont_depend_on_menu_size(self):
+        small_menu_url = reverse("api_v1:restaurants-menu-import", kwargs={"pk": RestaurantFactory(owner=self.user).pk})
+        big_menu_url = reverse("api_v1:restaurants-menu-import", kwargs={"pk": RestaurantFactory(owner=self.user).pk})
+        # the token and the memberships of the user are cached by the first request
+        warm_up_caches(self.user)
+
+        def menu(items_count):
+            return json.dumps({"items": [
+                {"category": "Category {}".format(index % 3), "name": "Item {}".format(index),
+                 "short_description": "Item", "sizes": [{"size": "Small", "price": 10}, {"size": "Large", "price": 20}]}
+                for index in range(items_count)
+            ]})
+
+        with CaptureQueriesContext(connection) as small_menu_queries:
+            response = self.client.post(small_menu_url, data=menu(2), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as big_menu_queries:
+            response = self.client.post(big_menu_url, data=menu(50), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data.get('item_size_details'), 100)
+        self.assertEqual(len(small_menu_queries), len(big_menu_queries))
+
+    def test_import_menu_csv(self):
+        restaurant = RestaurantFactory(owner=self.user)
+        url = reverse("api_v1:restaurants-menu-import", kwargs={"pk": restaurant.pk})
+        data = ("category,name,short_description,size,price\n"
+                "Pizza,Chicken Pizza,Delecious Pizza!,Medium,50\n"
+                "Pizza,Chicken Pizza,Delecious Pizza!,Large,80\n"
+                "Drinks,Cola,Cold,Small,10\n")
+
+        response = self.client.post(url, data=data, content_type='text/csv')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Item.objects.filter(restaurant=restaurant).count(), 2)
+        self.assertEqual(ItemSizeDetails.objects.filter(item__restaurant=restaurant).count(), 3)
+
+    def test_import_menu_row_errors(self):
+        restaurant = RestaurantFactory(owner=self.user)
+        url = reverse("api_v1:restaurants-menu-import", kwargs={"pk": restaurant.pk})
+        data = ("category,name,short_description,size,price\n"
+                "Pizza,Chicken Pizza,Delecious Pizza!,Medium,50\n"
+                "Pizza,Meat Pizza,Delecious Pizza!,Large,free\n"
+                "Drinks,,Cold,Small,10\n")
+
+        response = self.client.post(url, data=data, content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json().get('errors')
+        self.assertEqual([error.get('row') for error in errors], [3, 4])
+        self.assertIn('price', errors[0].get('errors').get('sizes')[0])
+        self.assertIn('name', errors[1].get('errors'))
+        self.assertEqual(Item.objects.filter(restaurant=restaurant).count(), 0)
+
     def test_create_restaurant(self):
         url = reverse("api_v1:restaurants-list")
         data = {
@@ -41,7 +426,7 @@ class TestRestaurantAPIViews(APITestCase):
         self.assertEqual(Restaurant.objects.count(), 1)
 
     def test_update_restaurant(self):
-        restaurant = RestaurantFactory()
+        restaurant = RestaurantFactory(owner=self.user)
         self.assertEqual(Restaurant.objects.count(), 1)
 
         url = reverse("api_v1:restaurants-detail", kwargs={"pk": restaurant.pk})
@@ -60,7 +445,7 @@ class TestRestaurantAPIViews(APITestCase):
         self.assertEqual(restaurant.address, data.get('address'))
 
     def test_delete_restaurant(self):
-        restaurant = RestaurantFactory()
+        restaurant = RestaurantFactory(owner=self.user)
         self.assertEqual(Restaurant.objects.count(), 1)
 
         url = reverse("api_v1:restaurants-detail", kwargs={"pk": restaurant.pk})
@@ -82,6 +467,7 @@ class TestCategoryAPIViews(APITestCase):
         token, _ = Token.objects.get_or_create(user=self.user)
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
         self.restaurant = self.restaurant
+        self.restaurant.users.add(self.user)
 
     def test_list_categories(self):
         CategoryFactory.create_batch(10, restaurant=self.restaurant)
@@ -142,6 +528,7 @@ class TestItemSizeAPIViews(APITestCase):
         token, _ = Token.objects.get_or_create(user=self.user)
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
         self.restaurant = self.restaurant
+        self.restaurant.users.add(self.user)
 
     def test_list_item_sizes(self):
         ItemSizeFactory.create_batch(10, restaurant=self.restaurant)
@@ -205,6 +592,7 @@ class TestItemAPIViews(APITestCase):
         token, _ = Token.objects.get_or_create(user=self.user)
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
         self.restaurant = self.restaurant
+        self.restaurant.users.add(self.user)
         self.category = self.category
         self.item_size1 = self.item_size1
         self.item_size2 = self.item_size2
@@ -220,6 +608,117 @@ class TestItemAPIViews(APITestCase):
         self.assertEqual(Item.objects.filter(restaurant=self.restaurant).count(), response.data.get('count'))
         self.assertEqual(10, response.data.get('count'))
 
+    def test_list_items_with_cursor(self):
+        items = ItemFactory.create_batch(15, restaurant=self.restaurant)
+        ItemFactory.create_batch(5)
+        url = reverse("api_v1:items-list", kwargs={"restaurant_id": self.restaurant.pk}) + "?cursor=&limit=10"
+
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data.get('results')), 10)
+        self.assertEqual(response.data.get('previous'), None)
+
+        response = self.client.get(response.data.get('next'), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data.get('results')), 5)
+        self.assertEqual(response.data.get('next'), None)
+        self.assertEqual(response.data.get('results')[-1].get('id'), items[0].pk)
+
+    def test_list_items_with_cursor_and_search(self):
+        url = reverse("api_v1:items-list", kwargs={"restaurant_id": self.restaurant.pk}) + "?cursor=&search=pizza"
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('search', response.data['errors'])
+
+    def test_list_items_not_modified(self):
+        item = ItemFactory(restaurant=self.restaurant)
+        url = reverse("api_v1:items-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(3):  # savepoint, max(modified) and count, release savepoint
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url + "?limit=1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        item.name = 'Meat Pizza'
+        item.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_items_cached(self):
+        ItemFactory(restaurant=self.restaurant, category=self.category, name='Margherita')
+        url = reverse("api_v1:items-list", kwargs={"restaurant_id": self.restaurant.pk})
+        warm_up_caches(self.user)
+
+        with self.settings(RESTAURANT_RESPONSE_CACHE_TIMEOUT=60):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            with self.assertNumQueries(2):  # savepoint, release savepoint
+                cached_response = self.client.get(url)
+            self.assertEqual(cached_response.status_code, 200)
+            self.assertEqual(cached_response.content, response.content)
+            self.assertEqual(cached_response['ETag'], response['ETag'])
+
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+            # a deleted row doesn't move the Last-Modified of a list, so it's not validated by it
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=cached_response['Last-Modified'])
+            self.assertEqual(response.status_code, 200)
+
+            # the other query strings are cached apart
+            response = self.client.get(url, {"limit": 1})
+            self.assertEqual(len(response.data.get('results')), 1)
+
+            # and a change of the menu bumps its version
+            ItemFactory(restaurant=self.restaurant, category=self.category, name='Pepperoni')
+            run_commit_callbacks()
+            response = self.client.get(url)
+            self.assertEqual(json.loads(response.content.decode()).get('count'), 2)
+
+    def test_search_items(self):
+        pizzas = CategoryFactory(restaurant=self.restaurant, name='Pizzas')
+        margherita = ItemFactory(restaurant=self.restaurant, category=pizzas, name='Margherita',
+                                 short_description='Tomato and mozzarella')
+        salad = ItemFactory(restaurant=self.restaurant, category=self.category, name='Caprese salad',
+                            short_description='Tomatoes and mozzarella')
+        ItemFactory(restaurant=self.restaurant, category=self.category, name='Mozzarella sticks',
+                    short_description='Fried cheese')
+        ItemFactory(category=CategoryFactory(name='Pizzas'), name='Pepperoni', short_description='Pizza')
+        url = reverse("api_v1:items-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+        response = self.client.get(url, {"search": "tomato"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item.get('id') for item in response.data.get('results')}, {margherita.pk, salad.pk})
+
+        response = self.client.get(url, {"search": "pizza"})
+        self.assertEqual([item.get('id') for item in response.data.get('results')], [margherita.pk])
+
+        response = self.client.get(url, {"search": "mozzarella"})
+        self.assertEqual(response.data.get('count'), 3)
+        self.assertEqual(response.data.get('results')[-1].get('id'), margherita.pk)
+
+        pizzas.name = 'Italian'
+        pizzas.save()
+        response = self.client.get(url, {"search": "italian"})
+        self.assertEqual([item.get('id') for item in response.data.get('results')], [margherita.pk])
+
+    def test_search_items_of_all_restaurants(self):
+        item = ItemFactory(restaurant=self.restaurant, name='Chicken Pizza')
+        other_item = ItemFactory(name='Chicken Burger')
+        ItemFactory(name='Beef Burger')
+        url = reverse("api_v1:restaurants-items-search")
+
+        response = self.client.get(url, {"search": "chicken"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item.get('id') for item in response.data.get('results')}, {item.pk, other_item.pk})
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 400)
+
     def test_create_item(self):
         url = reverse("api_v1:items-list", kwargs={"restaurant_id": self.restaurant.pk})
         data = {
@@ -267,6 +766,181 @@ class TestItemAPIViews(APITestCase):
         self.assertTrue(item.sizes.filter(pk=self.item_size1.pk).exists())
         self.assertTrue(item.sizes.filter(pk=self.item_size2.pk).exists())
 
+    @mock.patch('food_delivery_app.restaurants.signals.transaction.on_commit',
+                side_effect=lambda callback, using=None: callback())
+    def test_upload_item_image_renditions(self, on_commit):
+        item = ItemFactory(restaurant=self.restaurant, category=self.category)
+        url = reverse("api_v1:items-detail", kwargs={"restaurant_id": self.restaurant.pk, "pk": item.pk})
+        image = Image.new('RGB', (1600, 1200), 'red')
+        upload = io.BytesIO()
+        # a photo taken with the phone rotated, orientation 6 is a 90 degrees clockwise rotation
+        exif = (b'Exif\x00\x00MM\x00*\x00\x00\x00\x08\x00\x01\x01\x12\x00\x03'
+                b'\x00\x00\x00\x01\x00\x06\x00\x00\x00\x00\x00\x00')
+        image.save(upload, 'JPEG', exif=exif)
+        upload.name = 'photo.jpg'
+        upload.seek(0)
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root, MEDIA_URL='/media/'):
+            response = self.client.patch(url, data={"image": upload}, format='multipart')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get(url)
+            renditions = response.data.get('image_renditions')
+            self.assertEqual(set(renditions), {'thumbnail', 'medium'})
+            self.assertTrue(renditions['medium']['webp'].startswith('http://testserver/media/items/'))
+            item.refresh_from_db()
+            with Image.open(os.path.join(media_root, item.image_renditions['thumbnail']['jpeg'])) as thumbnail:
+                self.assertEqual(thumbnail.size, (150, 200))
+                self.assertNotIn('exif', thumbnail.info)
+            with Image.open(os.path.join(media_root, item.image_renditions['medium']['webp'])) as medium:
+                self.assertEqual((medium.format, medium.size), ('WEBP', (600, 800)))
+
+            medium_path = os.path.join(media_root, item.image_renditions['medium']['jpeg'])
+            item.image = None
+            item.save()
+            item.refresh_from_db()
+            self.assertEqual(item.image_renditions, {})
+            self.assertFalse(os.path.exists(medium_path))
+
+    def test_only_members_change_items(self):
+        user = UserFactory()
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        url = reverse("api_v1:items-list", kwargs={"restaurant_id": self.restaurant.pk})
+        data = {"category": self.category.pk, "name": "Pizza", "short_description": "Pizza",
+                "item_sizes": [{"size": self.item_size1.pk, "price": 50}]}
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+        self.restaurant.users.add(user)
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        # the memberships are cached by the first request
+        self.assertFalse([query for query in queries if 'restaurants_restaurant_users' in query['sql']])
+
+        self.restaurant.users.remove(user)
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+        restaurant = Restaurant.objects.get(pk=self.restaurant.pk)
+        restaurant.owner = user
+        restaurant.save()
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_items_of_unknown_restaurant(self):
+        url = reverse("api_v1:items-list", kwargs={"restaurant_id": 0})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse([query for query in queries if 'restaurants_item' in query['sql']])
+
+    def test_restaurant_resolved_once_per_request(self):
+        url = reverse("api_v1:items-list", kwargs={"restaurant_id": self.restaurant.pk})
+        data = {
+            "category": self.category.pk,
+            "name": "Chicken Pizza",
+            "short_description": "Delecious Pizza!",
+            "item_sizes": [{"size": self.item_size1.pk, "price": 50}, {"size": self.item_size2.pk, "price": 100}]
+        }
+
+        def restaurant_queries(queries):
+            return [query for query in queries if query['sql'].startswith('SELECT') and
+                    'FROM "restaurants_restaurant"' in query['sql']]
+
+        # the token and the memberships of the user are cached by the first request
+        warm_up_caches(self.user)
+        with self.settings(RESTAURANT_CACHE_TIMEOUT=0), CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(restaurant_queries(queries)), 1)
+
+        cache.delete(restaurant_cache_key(self.restaurant.pk))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(restaurant_queries(queries)), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(restaurant_queries(queries), [])
+
+        self.restaurant.save()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len(restaurant_queries(queries)), 1)
+
+    def test_upload_item_image_with_ticket(self):
+        item = ItemFactory(restaurant=self.restaurant, category=self.category)
+        other_item = ItemFactory(restaurant=self.restaurant, category=self.category)
+        kwargs = {"restaurant_id": self.restaurant.pk, "pk": item.pk}
+        url = reverse("api_v1:items-upload", kwargs=kwargs)
+        confirm_url = reverse("api_v1:items-upload-confirm", kwargs=kwargs)
+        photo = io.BytesIO()
+        Image.new('RGB', (8, 8)).save(photo, 'JPEG')
+        photo = photo.getvalue()
+        data = {"filename": "pizza.jpg", "content_type": "image/jpeg", "size": len(photo)}
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root, MEDIA_URL='/media/'):
+            response = self.client.post(url, data=data)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.data.get('method'), 'PUT')
+            ticket, key, upload_url = response.data.get('ticket'), response.data.get('key'), response.data.get('url')
+            self.assertTrue(key.startswith('items/container_{}/pizza-'.format(self.restaurant.pk)))
+
+            response = self.client.post(confirm_url, data={"ticket": ticket})
+            self.assertEqual(response.status_code, 400)
+            response = self.client.put(upload_url, data=photo + b'too large', content_type='image/jpeg')
+            self.assertEqual(response.status_code, 400)
+            response = self.client.put(upload_url, data=photo, content_type='image/jpeg')
+            self.assertEqual(response.status_code, 201)
+
+            other_confirm_url = reverse("api_v1:items-upload-confirm",
+                                        kwargs={"restaurant_id": self.restaurant.pk, "pk": other_item.pk})
+            response = self.client.post(other_confirm_url, data={"ticket": ticket})
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post(confirm_url, data={"ticket": ticket[:-1]})
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.post(confirm_url, data={"ticket": ticket})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data.get('image'), 'http://testserver/media/' + key)
+            item.refresh_from_db()
+            self.assertEqual(item.image.name, key)
+            self.assertEqual(item.image.read(), photo)
+
+    def test_upload_item_image_with_ticket_not_an_image(self):
+        item = ItemFactory(restaurant=self.restaurant, category=self.category)
+        kwargs = {"restaurant_id": self.restaurant.pk, "pk": item.pk}
+        url = reverse("api_v1:items-upload", kwargs=kwargs)
+        confirm_url = reverse("api_v1:items-upload-confirm", kwargs=kwargs)
+
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root, MEDIA_URL='/media/'):
+            response = self.client.post(url, data={"filename": "pizza.jpg", "content_type": "image/jpeg", "size": 5})
+            ticket, key, upload_url = response.data.get('ticket'), response.data.get('key'), response.data.get('url')
+            response = self.client.put(upload_url, data=b'<svg>', content_type='image/jpeg')
+            self.assertEqual(response.status_code, 201)
+
+            response = self.client.post(confirm_url, data={"ticket": ticket})
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(os.path.exists(os.path.join(media_root, key)))
+            item.refresh_from_db()
+            self.assertFalse(item.image)
+
+    def test_upload_item_image_ticket_validation(self):
+        item = ItemFactory(restaurant=self.restaurant, category=self.category)
+        url = reverse("api_v1:items-upload", kwargs={"restaurant_id": self.restaurant.pk, "pk": item.pk})
+
+        response = self.client.post(url, data={"filename": "menu.pdf", "content_type": "application/pdf", "size": 5})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, data={"filename": "pizza.jpg", "content_type": "image/jpeg",
+                                               "size": 100 * 1024 * 1024})
+        self.assertEqual(response.status_code, 400)
+
     def test_update_item_size_price(self):
         item = ItemFactory(restaurant=self.restaurant)
         ItemSizeDetailsFactory(item=item, size=self.item_size1, price=100)
@@ -312,6 +986,71 @@ class TestItemAPIViews(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertFalse(item.size_details.filter(size_id=self.item_size2.pk).exists())
 
+    def test_update_item_keeps_ordered_sizes(self):
+        item = ItemFactory(restaurant=self.restaurant)
+        ItemSizeDetailsFactory(item=item, size=self.item_size1, price=100)
+        ordered_size = ItemSizeDetailsFactory(item=item, size=self.item_size2, price=200)
+        ItemOrderDetailsFactory(order=OrderFactory(restaurant=self.restaurant), item_size=ordered_size)
+
+        url = reverse("api_v1:items-detail", kwargs={"restaurant_id": self.restaurant.pk, "pk": item.pk})
+        data = {
+            "category": self.category.pk,
+            "name": "Meat Pizza",
+            "short_description": "Delecious Pizza!",
+            "item_sizes": [
+                {"size": self.item_size1.pk, "price": 40},
+            ]
+        }
+        response = self.client.put(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(item.size_details.filter(pk=ordered_size.pk).exists())
+
+    def test_update_item_keeps_other_items_sizes(self):
+        item = ItemFactory(restaurant=self.restaurant)
+        ItemSizeDetailsFactory(item=item, size=self.item_size1, price=100)
+        other_item_size_details = ItemSizeDetailsFactory(size=self.item_size2, price=200)
+
+        url = reverse("api_v1:items-detail", kwargs={"restaurant_id": self.restaurant.pk, "pk": item.pk})
+        data = {
+            "category": self.category.pk,
+            "name": "Meat Pizza",
+            "short_description": "Delecious Pizza!",
+            "item_sizes": [
+                {"size": self.item_size2.pk, "price": 80},
+            ]
+        }
+        response = self.client.put(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(item.size_details.values_list('size_id', 'price')), [(self.item_size2.pk, 80)])
+        self.assertTrue(ItemSizeDetails.objects.filter(pk=other_item_size_details.pk, price=200).exists())
+
+    def test_update_item_queries_dont_depend_on_sizes_count(self):
+        sizes = ItemSizeFactory.create_batch(6, restaurant=self.restaurant)
+        # the token and the memberships of the user are cached by the first request
+        warm_up_caches(self.user)
+
+        def update_item(deleted_count):
+            item = ItemFactory(restaurant=self.restaurant)
+            url = reverse("api_v1:items-detail", kwargs={"restaurant_id": self.restaurant.pk, "pk": item.pk})
+            for size in sizes[:deleted_count + 1]:
+                ItemSizeDetailsFactory(item=item, size=size, price=100)
+            # delete the first sizes, update the price of the next one and add another one
+            data = {
+                "category": self.category.pk,
+                "name": "Meat Pizza",
+                "short_description": "Delecious Pizza!",
+                "item_sizes": [{"size": size.pk, "price": 50} for size in sizes[deleted_count:deleted_count + 2]]
+            }
+            with CaptureQueriesContext(connection) as queries, \
+                    mock.patch('food_delivery_app.restaurants.menu.transaction.on_commit') as on_commit:
+                response = self.client.put(url, data=json.dumps(data), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(item.size_details.order_by('size_id').values_list('size_id', 'price')),
+                             [(size.pk, 50) for size in sizes[deleted_count:deleted_count + 2]])
+            return len(queries), on_commit.call_count
+
+        self.assertEqual(update_item(1), update_item(3))
+
     def test_delete_item(self):
         item = create_item_with_sizes(self.restaurant, 5)
         self.assertEqual(Item.objects.count(), 1)
@@ -345,6 +1084,7 @@ class TestOrderAPIViews(APITestCase):
         token, _ = Token.objects.get_or_create(user=self.user)
         self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
         self.restaurant = self.restaurant
+        self.restaurant.users.add(self.user)
         self.item1 = self.item1
         self.item2 = self.item2
         self.item_size1 = self.item_size1
@@ -365,6 +1105,63 @@ class TestOrderAPIViews(APITestCase):
         self.assertEqual(Order.objects.filter(restaurant=self.restaurant).count(), response.data.get('count'))
         self.assertEqual(10, response.data.get('count'))
 
+    def test_list_orders_with_cursor(self):
+        orders = OrderFactory.create_batch(25, restaurant=self.restaurant)
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk}) + "?cursor="
+
+        ids = []
+        while url:
+            response = self.client.get(url, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids += [order.get('id') for order in response.data.get('results')]
+            url = response.data.get('next')
+        self.assertEqual(ids, [order.pk for order in reversed(orders)])
+
+    def test_list_orders_with_cursor_and_ordering(self):
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk}) + "?cursor=&ordering=status"
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('ordering', response.data['errors'])
+
+    def test_list_orders_with_invalid_cursor(self):
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk}) + "?cursor=invalid"
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_list_orders_queries_dont_depend_on_page_size(self):
+        for order in OrderFactory.create_batch(20, restaurant=self.restaurant):
+            ItemOrderDetailsFactory(order=order, item_size=self.item_size_details1)
+            ItemOrderDetailsFactory(order=order, item_size=self.item_size_details2)
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+        # the token and the memberships of the user are cached by the first request
+        warm_up_caches(self.user)
+
+        # savepoint, count, orders with customers, orders details, release savepoint
+        with self.assertNumQueries(5):
+            response = self.client.get(url + "?limit=5", content_type='application/json')
+        self.assertEqual(len(response.data.get('results')), 5)
+        with self.assertNumQueries(5):
+            response = self.client.get(url + "?limit=20", content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data.get('results')), 20)
+        self.assertEqual(len(response.data.get('results')[0].get('orders_details')), 2)
+        self.assertNotIn('items_sizes', response.data.get('results')[0])
+
+    def test_retrieve_order_queries(self):
+        order = OrderFactory(restaurant=self.restaurant)
+        ItemOrderDetailsFactory.create_batch(5, order=order, item_size=self.item_size_details1)
+        url = reverse("api_v1:orders-detail", kwargs={"restaurant_id": self.restaurant.pk, "pk": order.pk})
+        # the token and the memberships of the user are cached by the first request
+        warm_up_caches(self.user)
+
+        # savepoint, order with customer, orders details, release savepoint
+        with self.assertNumQueries(4):
+            response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.get('customer').get('id'), order.customer_id)
+        self.assertEqual(len(response.data.get('orders_details')), 5)
+
     def test_filter_list_orders_by_customers(self):
         customer1 = UserFactory()
         customer2 = UserFactory()
@@ -403,6 +1200,64 @@ class TestOrderAPIViews(APITestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(7, response.data.get('count'))
 
+    def test_filter_list_orders_by_status_set(self):
+        OrderFactory.create_batch(2, restaurant=self.restaurant, status=Order.PICKED)
+        OrderFactory.create_batch(3, restaurant=self.restaurant, status=Order.COOKING)
+        OrderFactory.create_batch(4, restaurant=self.restaurant, status=Order.DELIVERED)
+        OrderFactory.create_batch(5, restaurant=self.restaurant, status=Order.CANCELLED)
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+        response = self.client.get(url + "?status__in=1,2", content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(5, response.data.get('count'))
+
+        response = self.client.get(url + "?active=true", content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(5, response.data.get('count'))
+
+        response = self.client.get(url + "?active=false", content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(9, response.data.get('count'))
+
+    def test_filter_list_orders_by_dates(self):
+        now = timezone.now()
+        old_orders = OrderFactory.create_batch(3, restaurant=self.restaurant)
+        Order.objects.filter(pk__in=[order.pk for order in old_orders]).update(
+            created=now - timedelta(days=3), delivered_at=now - timedelta(days=2))
+        OrderFactory.create_batch(2, restaurant=self.restaurant, delivered_at=now)
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+        yesterday = (now - timedelta(days=1)).strftime('%Y-%m-%d %H:%M:%S')
+        response = self.client.get(url, {"created_after": yesterday})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(2, response.data.get('count'))
+
+        response = self.client.get(url, {"delivered_at_before": yesterday})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(3, response.data.get('count'))
+
+    def test_order_list_orders(self):
+        OrderFactory(restaurant=self.restaurant, total_price=200)
+        OrderFactory(restaurant=self.restaurant, total_price=100)
+        OrderFactory(restaurant=self.restaurant, total_price=300)
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+        response = self.client.get(url + "?ordering=-total_price", content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order.get('total_price') for order in response.data.get('results')], [300, 200, 100])
+
+    def test_list_orders_newest_first(self):
+        first_order = OrderFactory(restaurant=self.restaurant, total_price=200)
+        OrderFactory(restaurant=self.restaurant, total_price=100)
+        OrderFactory(restaurant=self.restaurant, total_price=300)
+        # modifying an order doesn't move it
+        first_order.save()
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+
+        response = self.client.get(url, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order.get('total_price') for order in response.data.get('results')], [300, 100, 200])
+
     def test_create_order(self):
         url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
         data = {
@@ -430,6 +1285,74 @@ class TestOrderAPIViews(APITestCase):
         self.assertTrue(order.items_sizes.filter(pk=self.item_size_details3.pk).exists())
         self.assertTrue(order.items_sizes.filter(pk=self.item_size_details4.pk).exists())
 
+    def test_customer_orders(self):
+        customer = UserFactory()
+        token, _ = Token.objects.get_or_create(user=customer)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+        other_order = OrderFactory(restaurant=self.restaurant)
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+        data = {"items_sizes": [{"item_size": self.item_size_details1.pk, "count": 1}], "address": "Cairo"}
+
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        order_url = reverse("api_v1:orders-detail", kwargs={"restaurant_id": self.restaurant.pk,
+                                                            "pk": response.data.get('id')})
+        response = self.client.get(order_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.get('customer').get('id'), customer.pk)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 403)
+        kwargs = {"restaurant_id": self.restaurant.pk, "pk": other_order.pk}
+        response = self.client.post(reverse("api_v1:orders-status", kwargs=kwargs))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse("api_v1:orders-detail", kwargs=kwargs))
+        self.assertEqual(response.status_code, 403)
+
+    def test_create_order_queries_dont_depend_on_items_count(self):
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+        data = {
+            "items_sizes": [
+                {"item_size": self.item_size_details1.pk, "count": 1},
+            ],
+            "address": "Cairo"
+        }
+        # the token and the memberships of the user are cached by the first request
+        warm_up_caches(self.user)
+        with CaptureQueriesContext(connection) as one_item_queries:
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        data["items_sizes"] = [
+            {"item_size": self.item_size_details1.pk, "count": 1},
+            {"item_size": self.item_size_details2.pk, "count": 2},
+            {"item_size": self.item_size_details3.pk, "count": 3},
+            {"item_size": self.item_size_details4.pk, "count": 4},
+            {"item_size": self.item_size_details4.pk, "count": 5},
+        ]
+        with CaptureQueriesContext(connection) as many_items_queries:
+            response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(one_item_queries), len(many_items_queries))
+        order = Order.objects.get(pk=response.data.get('id'))
+        self.assertEqual(order.total_price, 5000)  # 1 * 100 + 2 * 200 + 3 * 300 + 4 * 400 + 5 * 400
+        self.assertEqual(order.orders_details.count(), 5)
+
+    def test_create_order_with_invalid_item_size(self):
+        url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
+        data = {
+            "items_sizes": [
+                {"item_size": self.item_size_details1.pk, "count": 1},
+                {"item_size": 0, "count": 2},
+            ],
+            "address": "Cairo"
+        }
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertEqual(response.json()['items_sizes'][0], {})
+        self.assertIn('item_size', response.json()['items_sizes'][1])
+
     def test_create_order_then_update_item_price(self):
         url = reverse("api_v1:orders-list", kwargs={"restaurant_id": self.restaurant.pk})
         data = {
@@ -510,6 +1433,44 @@ class TestOrderAPIViews(APITestCase):
         self.assertEqual(order.total_price, 1000)  # 4 * 100 + 3 * 200
         self.assertEqual(order.items_sizes.count(), 2)
 
+    def test_update_order_keeps_untouched_items(self):
+        order = OrderFactory(restaurant=self.restaurant)
+        order_detail1 = ItemOrderDetailsFactory(order=order, item_size=self.item_size_details1, count=1)
+        order_detail2 = ItemOrderDetailsFactory(order=order, item_size=self.item_size_details2, count=2)
+        order_detail3 = ItemOrderDetailsFactory(order=order, item_size=self.item_size_details3, count=3)
+
+        url = reverse("api_v1:orders-detail", kwargs={"restaurant_id": self.restaurant.pk, "pk": order.pk})
+        data = {
+            "items_sizes": [
+                {"item_size": self.item_size_details1.pk, "count": 1},
+                {"item_size": self.item_size_details2.pk, "count": 5},
+                {"item_size": self.item_size_details4.pk, "count": 1},
+            ],
+            "address": "New Cairo"
+        }
+
+        response = self.client.put(url, data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, 1500)  # 1 * 100 + 5 * 200 + 1 * 400
+        self.assertEqual(order.orders_details.count(), 3)
+        self.assertEqual(order.orders_details.get(pk=order_detail1.pk).count, 1)
+        self.assertEqual(order.orders_details.get(pk=order_detail2.pk).count, 5)
+        self.assertFalse(order.orders_details.filter(pk=order_detail3.pk).exists())
+        self.assertTrue(order.orders_details.filter(item_size=self.item_size_details4).exists())
+
+    def test_partial_update_order_without_items(self):
+        order = OrderFactory(restaurant=self.restaurant)
+        ItemOrderDetailsFactory(order=order, item_size=self.item_size_details1, count=2)
+
+        url = reverse("api_v1:orders-detail", kwargs={"restaurant_id": self.restaurant.pk, "pk": order.pk})
+        response = self.client.patch(url, data=json.dumps({"comments": "No onions"}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.comments, "No onions")
+        self.assertEqual(order.total_price, 200)
+        self.assertEqual(order.orders_details.count(), 1)
+
     def test_update_order_status(self):
         order = OrderFactory(restaurant=self.restaurant, status=1)
 
@@ -568,6 +1529,57 @@ class TestOrderAPIViews(APITestCase):
         self.assertEqual(order.status, 4)
         self.assertEqual(response.json().get('errors'), "Can't cancel this order")
 
+    def test_update_status_of_concurrently_updated_order(self):
+        order = OrderFactory(restaurant=self.restaurant, status=1)
+        stale_order = Order.objects.get(pk=order.pk)
+        Order.objects.filter(pk=order.pk).update(status=2)
+
+        url = reverse("api_v1:orders-status", kwargs={"restaurant_id": self.restaurant.pk, "pk": order.pk})
+        with mock.patch.object(OrderViewSet, 'get_object', return_value=stale_order):
+            response = self.client.post(url, content_type='application/json')
+            self.assertEqual(response.status_code, 409)
+            response = self.client.delete(url, content_type='application/json')
+            self.assertEqual(response.status_code, 409)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 2)
+        self.assertEqual(order.cooked_at, None)
+
+    @mock.patch('food_delivery_app.restaurants.events.transaction.on_commit',
+                side_effect=lambda callback, using=None: callback())
+    def test_order_status_events(self, on_commit):
+        order = OrderFactory(restaurant=self.restaurant, status=1)
+        other_order = OrderFactory(restaurant=self.restaurant, status=1)
+
+        url = reverse("api_v1:orders-events", kwargs={"restaurant_id": self.restaurant.pk, "pk": order.pk})
+        order_stream = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(order_stream.status_code, 200)
+        self.assertEqual(order_stream['Content-Type'], 'text/event-stream')
+        url = reverse("api_v1:orders-restaurant-events", kwargs={"restaurant_id": self.restaurant.pk})
+        restaurant_stream = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(restaurant_stream.status_code, 200)
+        order_events = iter(order_stream.streaming_content)
+        restaurant_events = iter(restaurant_stream.streaming_content)
+        self.assertEqual(next(order_events), b': connected\n\n')
+        self.assertEqual(next(restaurant_events), b': connected\n\n')
+
+        for pk in (other_order.pk, order.pk):
+            url = reverse("api_v1:orders-status", kwargs={"restaurant_id": self.restaurant.pk, "pk": pk})
+            self.client.post(url, content_type='application/json')
+
+        event = next(order_events).decode()
+        self.assertTrue(event.startswith('event: status\ndata: '))
+        data = json.loads(event[len('event: status\ndata: '):])
+        self.assertEqual(data.get('id'), order.pk)
+        self.assertEqual(data.get('status'), 2)
+        self.assertNotEqual(data.get('cooked_at'), None)
+        self.assertIn('"id": {}'.format(other_order.pk), next(restaurant_events).decode())
+        self.assertIn('"id": {}'.format(order.pk), next(restaurant_events).decode())
+
+    def test_order_events_of_missing_order(self):
+        url = reverse("api_v1:orders-events", kwargs={"restaurant_id": self.restaurant.pk, "pk": 0})
+        response = self.client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 404)
+
     def test_delete_order(self):
         order = OrderFactory(restaurant=self.restaurant)
         url = reverse("api_v1:orders-detail", kwargs={"restaurant_id": self.restaurant.pk, "pk": order.pk})
@@ -576,3 +1588,26 @@ class TestOrderAPIViews(APITestCase):
         response = self.client.delete(url, content_type='application/json')
         self.assertEqual(response.status_code, 204)
         self.assertEqual(Order.objects.count(), 0)
+
+
+class TestEventStreamConnections(TransactionTestCase):
+    '''
+        The transaction of the request has to be over for the stream to close its connection,
+        so the test can't run in a transaction
+    '''
+
+    def test_event_stream_closes_the_database_connection(self):
+        user = UserFactory()
+        restaurant = RestaurantFactory(owner=user)
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION='Token ' + token.key)
+
+        url = reverse("api_v1:orders-restaurant-events", kwargs={"restaurant_id": restaurant.pk})
+        response = client.get(url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(connection.connection)
+        events = iter(response.streaming_content)
+        self.assertEqual(next(events), b': connected\n\n')
+        self.assertIsNone(connection.connection)
+        response.close()
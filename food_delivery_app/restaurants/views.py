@@ -1,120 +1,267 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS
 from django.db.models import ProtectedError
-from django.utils import timezone
-from rest_framework import viewsets, permissions, status
-from rest_framework.exceptions import ValidationError
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from rest_framework import viewsets, permissions, renderers, status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .serializers import RestaurantSerializer, CategorySerializer, ItemSizeSerializer, ItemSerializer, OrderSerializer
+from food_delivery_app.core.db_routers import read_from_replica
+from food_delivery_app.core.mixins import ConditionalGetMixin, ReplicaReadsMixin, UploadTicketMixin
+from food_delivery_app.core.utils import bulk_update_field
+
+from .serializers import (RestaurantSerializer, CategorySerializer, ItemSizeSerializer, ItemSerializer, OrderSerializer,
+                          OrderReadSerializer, MenuImportSerializer)
 from .models import Restaurant, Item, ItemSize, Category, Order, ItemOrderDetails, ItemSizeDetails
-from .filters import OrderFilter
+from .mixins import RestaurantNestedMixin, RestaurantShardMixin, CachedResponseMixin
+from .permissions import IsRestaurantMemberOrReadOnly, IsRestaurantMemberOrCustomer
+from .filters import OrderFilter, ItemSearchFilter
+from .exceptions import Conflict, RestaurantMoving
+from .pagination import CursorOrLimitOffsetPagination
+from .renderers import EventStreamRenderer
+from .sharding import get_restaurant_shard, is_restaurant_moving, ShardsResults
+from .menu import get_menu_locale, get_menu_snapshot, rebuild_menu_snapshot
+from .importers import MenuImporter
+from .autocomplete import suggest
+from .parsers import MenuCSVParser
+from .events import get_broker, publish_order_status, event_stream, order_channel, restaurant_channel
 
 User = get_user_model()
 
 
-class RestaurantViewSet(viewsets.ModelViewSet):
+class RestaurantViewSet(ReplicaReadsMixin, RestaurantShardMixin, ConditionalGetMixin, UploadTicketMixin,
+                        viewsets.ModelViewSet):
     serializer_class = RestaurantSerializer
     queryset = Restaurant.objects.all()
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [permissions.IsAuthenticated, IsRestaurantMemberOrReadOnly]
+    upload_field = 'logo'
+    restaurant_url_kwarg = 'pk'
+
+    @action(methods=['get'], detail=True, url_path='menu', url_name='menu')
+    def menu(self, request, pk):
+        '''
+            Serve the prerendered snapshot of the menu as is
+        '''
+        snapshot = self.get_menu_snapshot(pk, fields=('content',))
+        return HttpResponse(bytes(snapshot.content), content_type='application/json')
+
+    @action(methods=['get'], detail=True, url_path='menu/manifest', url_name='menu-manifest')
+    def menu_manifest(self, request, pk):
+        '''
+            Point the clients to the current published menu, which they fetch from the storage/CDN
+        '''
+        snapshot = self.get_menu_snapshot(pk, fields=('locale', 'version', 'export_path', 'modified'))
+        if not snapshot.export_path:
+            raise NotFound({"errors": "The menu isn't published"})
+        response = Response(status=status.HTTP_200_OK, data={
+            'restaurant': int(pk),
+            'locale': snapshot.locale,
+            'version': snapshot.version,
+            'url': request.build_absolute_uri(default_storage.url(snapshot.export_path)),
+            'published_at': snapshot.modified,
+        })
+        patch_cache_control(response, public=True, max_age=settings.MENU_MANIFEST_MAX_AGE)
+        return response
+
+    def get_menu_snapshot(self, pk, fields):
+        '''
+            The snapshot of the menu fetched by the restaurant id only, it's only built here if it's missing
+        '''
+        locale = get_menu_locale()
+        snapshot = get_menu_snapshot(pk, locale, fields) if pk.isdigit() else None
+        if snapshot is None:
+            if pk.isdigit() and is_restaurant_moving(pk):
+                raise RestaurantMoving()
+            # a lagging replica would render an older menu saved under the current version
+            read_from_replica(False)
+            snapshot = rebuild_menu_snapshot(self.get_object(), locale)
+        return snapshot
 
+    @action(methods=['get'], detail=False, url_path='autocomplete', url_name='autocomplete')
+    def autocomplete(self, request):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < settings.AUTOCOMPLETE_MIN_LENGTH:
+            return Response(status=status.HTTP_200_OK, data={'restaurants': [], 'items': []})
+        return Response(status=status.HTTP_200_OK, data=suggest(query))
 
-class ItemSizeViewSet(viewsets.ModelViewSet):
+    @action(methods=['get'], detail=False, url_path='items/search', url_name='items-search')
+    def search_items(self, request):
+        search_filter = ItemSearchFilter()
+        if not search_filter.get_search_terms(request):
+            raise ValidationError({"errors": "The search query param is required"})
+        queryset = Item.objects.defer('search_vector').prefetch_related('size_details')
+        queryset = search_filter.filter_queryset(request, queryset, self)
+        # the items of the restaurants of every shard, merged in the order of ItemSearchFilter
+        page = self.paginate_queryset(ShardsResults(queryset, key=lambda item: (-item.rank, -item.pk)))
+        serializer = ItemSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['post'], detail=True, url_path='menu/import', url_name='menu-import',
+            parser_classes=[JSONParser, MenuCSVParser])
+    def import_menu(self, request, pk):
+        restaurant = self.get_object()
+        serializer = MenuImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(status=status.HTTP_400_BAD_REQUEST, data={"errors": serializer.get_row_errors()})
+        data = MenuImporter(restaurant).import_menu(serializer.validated_data)
+        return Response(status=status.HTTP_201_CREATED, data=data)
+
+
+class ItemSizeViewSet(ReplicaReadsMixin, RestaurantNestedMixin, CachedResponseMixin, ConditionalGetMixin,
+                      viewsets.ModelViewSet):
     queryset = ItemSize.objects.all()
     serializer_class = ItemSizeSerializer
+    permission_classes = [permissions.IsAuthenticated, IsRestaurantMemberOrReadOnly]
 
     def get_queryset(self):
-        restaurant_id = int(self.kwargs.get('restaurant_id'))
-        return super().get_queryset().filter(restaurant_id=restaurant_id)
+        return super().get_queryset().filter(restaurant=self.get_restaurant())
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ReplicaReadsMixin, RestaurantNestedMixin, CachedResponseMixin, ConditionalGetMixin,
+                      viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    permission_classes = [permissions.IsAuthenticated, IsRestaurantMemberOrReadOnly]
 
     def get_queryset(self):
-        restaurant_id = int(self.kwargs.get('restaurant_id'))
-        return super().get_queryset().filter(restaurant_id=restaurant_id)
+        return super().get_queryset().filter(restaurant=self.get_restaurant())
 
 
-class ItemViewSet(viewsets.ModelViewSet):
+class ItemViewSet(ReplicaReadsMixin, RestaurantNestedMixin, CachedResponseMixin, ConditionalGetMixin,
+                  UploadTicketMixin, viewsets.ModelViewSet):
     serializer_class = ItemSerializer
-    queryset = Item.objects.all()
-    permission_classes = [permissions.IsAuthenticated]
+    # the search vector is only read by the database
+    queryset = Item.objects.defer('search_vector')
+    permission_classes = [permissions.IsAuthenticated, IsRestaurantMemberOrReadOnly]
+    pagination_class = CursorOrLimitOffsetPagination
+    filter_backends = (ItemSearchFilter,)
+    upload_field = 'image'
 
     def get_queryset(self):
-        restaurant_id = int(self.kwargs.get('restaurant_id'))
-        return super().get_queryset().filter(restaurant_id=restaurant_id)
+        return super().get_queryset().filter(restaurant=self.get_restaurant())
 
     def perform_create(self, serializer):
         item_sizes = serializer.validated_data.pop('item_sizes')
         item = serializer.save()
-        for item_size in item_sizes:
-            ItemSizeDetails.objects.create(item=item, **item_size)
+        ItemSizeDetails.objects.bulk_create([ItemSizeDetails(item=item, **item_size) for item_size in item_sizes])
         return item
 
     def perform_update(self, serializer):
-        item_sizes = serializer.validated_data.pop('item_sizes')
+        item_sizes = serializer.validated_data.pop('item_sizes', None)
         item = serializer.instance
         for field in serializer.validated_data:
             if Item._meta.get_field(field):
                 setattr(item, field, serializer.validated_data[field])
-
-        item_sizes_ids = []
-        for item_size in item_sizes:
-            item_sizes = ItemSizeDetails.objects.filter(item=item, size=item_size.get('size'))
-            if item_sizes.exists():
-                item_sizes.update(price=item_size.get('price'))
-                item_sizes_ids.append(item_sizes.first().pk)
-            else:
-                item_size = ItemSizeDetails.objects.create(item=item, **item_size)
-                item_sizes_ids.append(item_size.pk)
-
-        try:
-            ItemSizeDetails.objects.exclude(pk__in=item_sizes_ids).delete()
-        except ProtectedError as e:
-            raise ValidationError({"errors": e})
+        if item_sizes is not None:
+            self.update_size_details(item, item_sizes)
         item.save()
         return item
 
+    def update_size_details(self, item, item_sizes):
+        '''
+            Upsert the prices of the item's sizes and delete the sizes that aren't requested anymore,
+            with one read, bulk insert/update and one delete scoped to the item
+        '''
+        existing_details = {size_details.size_id: size_details for size_details in item.size_details.all()}
+        new_details, updated_prices = [], {}
+        for size_id, item_size in {item_size['size'].pk: item_size for item_size in item_sizes}.items():
+            size_details = existing_details.pop(size_id, None)
+            price = item_size.get('price', 1)
+            if size_details is None:
+                new_details.append(ItemSizeDetails(item=item, **item_size))
+            elif size_details.price != price:
+                updated_prices[size_details.pk] = price
+
+        deleted_details = [size_details.pk for size_details in existing_details.values()]
+        if deleted_details:
+            try:
+                item.size_details.filter(pk__in=deleted_details).delete()
+            except ProtectedError:
+                raise ValidationError({"errors": "The sizes of the item that were ordered can't be deleted"})
+        bulk_update_field(item.size_details.all(), 'price', updated_prices)
+        ItemSizeDetails.objects.bulk_create(new_details)
 
-class OrderViewSet(viewsets.ModelViewSet):
+
+class OrderViewSet(ReplicaReadsMixin, RestaurantNestedMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
-    queryset = Order.objects.all()
-    permission_classes = [permissions.IsAuthenticated]
+    # newest first, like the cursor pages, which the (restaurant, created) indexes serve
+    queryset = Order.objects.order_by('-created', '-id')
+    permission_classes = [permissions.IsAuthenticated, IsRestaurantMemberOrCustomer]
     filter_backends = (DjangoFilterBackend,)
     filterset_class = OrderFilter
+    pagination_class = CursorOrLimitOffsetPagination
 
     def get_queryset(self):
-        restaurant_id = int(self.kwargs.get('restaurant_id'))
-        return super().get_queryset().filter(restaurant_id=restaurant_id)
+        queryset = super().get_queryset().filter(restaurant=self.get_restaurant())
+        if self.action in ('list', 'retrieve'):
+            if get_restaurant_shard(self.get_restaurant().pk) == DEFAULT_DB_ALIAS:
+                queryset = queryset.select_related('customer')
+            else:
+                # the customers are on the primary, they can't be joined to the orders of the other shards
+                queryset = queryset.prefetch_related('customer')
+            queryset = queryset.prefetch_related('orders_details')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return OrderReadSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         items_sizes = serializer.validated_data.pop('items_sizes')
-        order = serializer.save()
-        for item_size in items_sizes:
-            ItemOrderDetails.objects.create(order=order, **item_size)
-
-        order.total_price = order.get_total_price()
-        order.save()
+        order = serializer.save(total_price=Order.calculate_total_price(items_sizes))
+        ItemOrderDetails.objects.bulk_create(
+            [ItemOrderDetails(order=order, **item_size) for item_size in items_sizes]
+        )
         return order
 
     def perform_update(self, serializer):
-        items_sizes = serializer.validated_data.pop('items_sizes')
+        items_sizes = serializer.validated_data.pop('items_sizes', None)
         order = serializer.instance
         for field in serializer.validated_data:
             if Order._meta.get_field(field):
                 setattr(order, field, serializer.validated_data[field])
-        ItemOrderDetails.objects.filter(order=order).delete()
-        for item_size in items_sizes:
-            ItemOrderDetails.objects.create(order=order, **item_size)
+        if items_sizes is not None:
+            self.update_orders_details(order, items_sizes)
 
         order.total_price = order.get_total_price()
-        order.save()
+        order.save(update_fields=list(serializer.validated_data) + ['total_price', 'modified'])
         return order
 
+    def update_orders_details(self, order, items_sizes):
+        '''
+            Diff the requested lines against the existing ones by item size,
+            so untouched lines are kept and the rest is applied with bulk queries
+        '''
+        existing_details = {}
+        for order_detail in order.orders_details.all():
+            existing_details.setdefault(order_detail.item_size_id, []).append(order_detail)
+
+        new_details, updated_counts = [], {}
+        for item_size in items_sizes:
+            order_details = existing_details.get(item_size['item_size'].pk)
+            if not order_details:
+                new_details.append(ItemOrderDetails(order=order, **item_size))
+                continue
+            order_detail = order_details.pop(0)
+            count = item_size.get('count', 1)
+            if order_detail.count != count:
+                updated_counts[order_detail.pk] = count
+
+        deleted_details = [order_detail.pk for order_details in existing_details.values()
+                           for order_detail in order_details]
+        if deleted_details:
+            ItemOrderDetails.objects.filter(pk__in=deleted_details).delete()
+        bulk_update_field(order.orders_details.all(), 'count', updated_counts)
+        ItemOrderDetails.objects.bulk_create(new_details)
+
     @action(methods=['post', 'delete'], detail=True, url_path='status', url_name='status')
     def status(self, request, restaurant_id, pk):
         order = self.get_object()
@@ -124,22 +271,35 @@ class OrderViewSet(viewsets.ModelViewSet):
             self.cancel_order(order)
         return Response(status=status.HTTP_200_OK, data=OrderSerializer(instance=order).data)
 
+    @action(methods=['get'], detail=True, url_path='events', url_name='events',
+            renderer_classes=[renderers.JSONRenderer, EventStreamRenderer])
+    def events(self, request, restaurant_id, pk):
+        order = self.get_object()
+        return self.stream_events([order_channel(order.pk)])
+
+    @action(methods=['get'], detail=False, url_path='events', url_name='restaurant-events',
+            renderer_classes=[renderers.JSONRenderer, EventStreamRenderer])
+    def restaurant_events(self, request, restaurant_id):
+        return self.stream_events([restaurant_channel(self.get_restaurant().pk)])
+
+    def stream_events(self, channels):
+        response = StreamingHttpResponse(event_stream(get_broker().subscribe(channels)),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
     def update_status(self, order):
         if order.status < len(Order.STATUS_CHOICES) - 1:
-            order.status += 1
-            if order.status == Order.COOKING:
-                order.cooked_at = timezone.now()
-            elif order.status == Order.READY:
-                order.ready_at = timezone.now()
-            elif order.status == Order.ONTHEWAY:
-                order.on_the_way_at = timezone.now()
-            elif order.status == Order.DELIVERED:
-                order.delivered_at = timezone.now()
-            order.save()
+            self.transition_status(order, order.status + 1)
 
     def cancel_order(self, order):
         if order.status < Order.ONTHEWAY:
-            order.status = Order.CANCELLED
-            order.save()
+            self.transition_status(order, Order.CANCELLED)
         else:
             raise ValidationError({"errors": "Can't cancel this order"})
+
+    def transition_status(self, order, new_status):
+        if not order.transition_status(new_status):
+            raise Conflict({"errors": "Order status was changed by another request"})
+        publish_order_status(order)
@@ -5,3 +5,6 @@ class UsersAppConfig(AppConfig):
 
     name = "food_delivery_app.users"
     verbose_name = "Users"
+
+    def ready(self):
+        from . import signals  # noqa F401
@@ -0,0 +1,42 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from food_delivery_app.core.cache import LocalTTLCache
+
+local_tokens_cache = LocalTTLCache(maxsize=settings.TOKEN_LOCAL_CACHE_SIZE, ttl=settings.TOKEN_LOCAL_CACHE_TTL)
+
+
+def token_cache_key(key):
+    # the token itself is a credential, so it isn't used in the shared cache keys
+    return 'tokens:{}'.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def clear_cached_tokens(keys):
+    '''
+        Drop the tokens from the shared cache and the cache of this process,
+        the other processes keep them for TOKEN_LOCAL_CACHE_TTL seconds at most
+    '''
+    keys = list(keys)
+    for key in keys:
+        local_tokens_cache.delete(key)
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''
+        TokenAuthentication that looks the token and its user up in a short lived in-process cache,
+        then in the shared cache and only then in the database
+    '''
+
+    def authenticate_credentials(self, key):
+        credentials = local_tokens_cache.get(key)
+        if credentials is None:
+            credentials = cache.get(token_cache_key(key))
+            if credentials is None:
+                credentials = super().authenticate_credentials(key)
+                cache.set(token_cache_key(key), credentials, settings.TOKEN_CACHE_TIMEOUT)
+            local_tokens_cache.set(key, credentials)
+        return credentials
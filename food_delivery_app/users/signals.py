@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import clear_cached_tokens
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token, dispatch_uid='token_deleted_clear_cache')
+def token_deleted(sender, instance, **kwargs):
+    key = instance.key
+    clear_cached_tokens([key])
+    # and once more after commit, in case a concurrent request cached the token meanwhile
+    transaction.on_commit(lambda: clear_cached_tokens([key]))
+
+
+@receiver(post_save, sender=User, dispatch_uid='user_saved_clear_tokens_cache')
+def user_saved(sender, instance, created, **kwargs):
+    '''
+        The cached tokens hold the user too, so drop them when the user changes,
+        a deactivated user must not be authenticated from the cache
+    '''
+    if created:
+        return
+    keys = list(Token.objects.filter(user=instance).values_list('key', flat=True))
+    if keys:
+        clear_cached_tokens(keys)
+        transaction.on_commit(lambda: clear_cached_tokens(keys))
@@ -0,0 +1,44 @@
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from ..authentication import CachedTokenAuthentication, local_tokens_cache
+from .factories import UserFactory
+
+
+class TestCachedTokenAuthentication(TestCase):
+
+    def setUp(self):
+        local_tokens_cache.clear()
+        self.user = UserFactory()
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def test_authenticate_from_cache(self):
+        user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual((user, token), (self.user, self.token))
+
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+        local_tokens_cache.clear()
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(self.token.key)
+        self.assertEqual(user, self.user)
+
+    def test_deleted_token(self):
+        key = self.token.key
+        self.authentication.authenticate_credentials(key)
+
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(key)
+
+    def test_deactivated_user(self):
+        self.authentication.authenticate_credentials(self.token.key)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.token.key)